@@ -4,7 +4,7 @@ from .models import Message
 
 
 class MessageAdmin(admin.ModelAdmin):
-    list_display = ['message', 'username', 'pub_date']
+    list_display = ['room', 'message', 'username', 'pub_date']
 
 
 admin.site.register(Message, MessageAdmin)
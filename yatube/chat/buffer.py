@@ -0,0 +1,113 @@
+"""Write-behind persistence of chat messages.
+
+Consumers hand messages to ``message_buffer`` and broadcast them right
+away; the buffer saves them with one ``bulk_create`` when
+``CHAT_BUFFER_SIZE`` messages are pending or ``CHAT_FLUSH_INTERVAL_MS``
+after the first of them arrived, whichever comes first.
+
+Messages are checked when queued, with text fields cut to their
+``max_length``, so that one bad row cannot fail a whole batch; should a
+batch fail anyway, its messages are saved one by one. Messages still
+pending at interpreter exit are saved then, and are lost only if the
+process is killed.
+"""
+import asyncio
+import atexit
+import logging
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError
+
+from .models import Message
+
+logger = logging.getLogger(__name__)
+
+
+class MessageBuffer:
+
+    def __init__(self, max_size, interval):
+        self.max_size = max_size
+        self.interval = interval
+        self._pending = []
+        self._timer = None
+        self._writes = set()
+
+    @staticmethod
+    def _fit(message):
+        """Cut the text of ``message`` to its fields and check it; False
+        if it cannot be saved."""
+        for field in message._meta.concrete_fields:
+            value = getattr(message, field.attname)
+            if field.max_length and isinstance(value, str):
+                setattr(message, field.attname, value[:field.max_length])
+        try:
+            message.full_clean()
+        except ValidationError as error:
+            logger.warning('Dropped a chat message: %s', error)
+            return False
+        return True
+
+    def add(self, message):
+        """Queue ``message``; False if it is invalid and was dropped.
+        Must be called from the event loop."""
+        if not self._fit(message):
+            return False
+        self._pending.append(message)
+        if len(self._pending) >= self.max_size:
+            self._start_write()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.interval, self._start_write)
+        return True
+
+    def _start_write(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        write = asyncio.ensure_future(self._write(batch))
+        self._writes.add(write)
+        write.add_done_callback(self._writes.discard)
+
+    @staticmethod
+    def _save(batch):
+        try:
+            Message.objects.bulk_create(batch)
+        except DatabaseError:
+            logger.exception('Could not save %d chat messages at once, '
+                             'saving them one by one', len(batch))
+            for message in batch:
+                try:
+                    message.save()
+                except DatabaseError:
+                    logger.exception('Could not save a chat message')
+
+    async def _write(self, batch):
+        try:
+            await database_sync_to_async(self._save)(batch)
+        except Exception:
+            logger.exception('Could not save %d chat messages', len(batch))
+
+    async def flush(self):
+        """Save everything pending and wait for writes in progress."""
+        self._start_write()
+        if self._writes:
+            await asyncio.gather(*self._writes)
+
+    def flush_pending(self):
+        """Save what is pending from outside the event loop, at exit."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self._save(batch)
+
+
+message_buffer = MessageBuffer(settings.CHAT_BUFFER_SIZE,
+                               settings.CHAT_FLUSH_INTERVAL_MS / 1000)
+atexit.register(message_buffer.flush_pending)
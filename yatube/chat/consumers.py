@@ -1,56 +1,50 @@
 import json
 
-from asgiref.sync import async_to_sync
-from channels.generic.websocket import WebsocketConsumer
+from channels.generic.websocket import AsyncWebsocketConsumer
 
+from .buffer import message_buffer
 from .models import Message
 
 
-class ChatConsumer(WebsocketConsumer):
+class ChatConsumer(AsyncWebsocketConsumer):
 
-    def connect(self):
+    async def connect(self):
         self.room_name = self.scope['url_route']['kwargs']['room_name']
         self.room_group_name = 'chat_%s' % self.room_name
-        async_to_sync(self.channel_layer.group_add)(
+        await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
-        self.accept()
+        await self.accept()
 
-    def disconnect(self, close_code):
-        async_to_sync(self.channel_layer.group_discard)(
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
 
-    def receive(self, text_data):
+    async def receive(self, text_data):
         text_data_json = json.loads(text_data)
-        message = text_data_json['message']
-        username = text_data_json['username']
-
-        save_message = Message.objects.create(
-            message=message,
-            username=username
+        message = Message(
+            room=self.room_name,
+            message=text_data_json['message'],
+            username=text_data_json['username']
         )
+        if not message_buffer.add(message):
+            return
 
-        async_to_sync(self.channel_layer.group_send)(
+        await self.channel_layer.group_send(
             self.room_group_name,
             {
                 'type': 'chat_message',
-                'message': message,
-                'username': username,
-                'pub_date': save_message.pub_date
+                **message.as_dict()
             }
         )
 
-    def chat_message(self, event):
-        message = event['message']
-        username = event['username']
-        pub_date = event['pub_date']
-
-        self.send(text_data=json.dumps({
+    async def chat_message(self, event):
+        await self.send(text_data=json.dumps({
             'event': "Send",
-            'message': message,
-            'username': username,
-            'pub_date': str(pub_date),
+            'message': event['message'],
+            'username': event['username'],
+            'pub_date': event['pub_date'],
         }))
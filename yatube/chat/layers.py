@@ -0,0 +1,266 @@
+"""Channel layer shared by all worker processes on one host.
+
+``InMemoryChannelLayer`` only delivers within its own process, so a
+``group_send`` from one Daphne worker never reached sockets served by
+another. ``SQLiteChannelLayer`` keeps channel queues and group membership
+in a SQLite file (WAL mode) that every worker opens:
+
+    CHANNEL_LAYERS = {'default': {
+        'BACKEND': 'chat.layers.SQLiteChannelLayer',
+        'CONFIG': {'path': '/var/run/yatube/channels.sqlite3'},
+    }}
+
+Each layer instance reads the channels it created (``specific.<prefix>!…``)
+with one polling task per event loop and hands messages out to in-process
+queues; other channels are polled directly. Capacity, message expiry and
+group expiry behave as in the in-memory layer. Use the redis layer when
+workers run on more than one host.
+"""
+import asyncio
+import random
+import sqlite3
+import string
+import threading
+import time
+
+import msgpack
+from asgiref.sync import sync_to_async
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channel_message (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    expires REAL NOT NULL,
+    body BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS channel_message_channel
+    ON channel_message (channel, id);
+CREATE TABLE IF NOT EXISTS channel_group (
+    name TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    joined REAL NOT NULL,
+    PRIMARY KEY (name, channel)
+);
+CREATE INDEX IF NOT EXISTS channel_group_channel
+    ON channel_group (channel);
+"""
+
+
+def _random_name(length=12):
+    return ''.join(random.choice(string.ascii_letters) for _ in range(length))
+
+
+class SQLiteChannelLayer(BaseChannelLayer):
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, path, expiry=60, group_expiry=86400, capacity=100,
+                 channel_capacity=None, poll_interval=0.005,
+                 max_poll_interval=0.1, batch_size=100, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity,
+                         channel_capacity=channel_capacity, **kwargs)
+        self.path = path
+        self.group_expiry = group_expiry
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.batch_size = batch_size
+        self.client_prefix = _random_name()
+        self._local = threading.local()
+        self._schema_ready = False
+        self._buffers = {}
+        self._receivers = 0
+        self._reader = None
+
+    # Storage
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            if not self._schema_ready:
+                connection.executescript(SCHEMA)
+                self._schema_ready = True
+            self._local.connection = connection
+        return connection
+
+    def _transaction(self, operation, *args):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = operation(connection, *args)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return result
+
+    async def _run(self, operation, *args):
+        return await sync_to_async(self._transaction, thread_sensitive=False)(
+            operation, *args)
+
+    def _clean_expired(self, connection):
+        """Drop expired messages, their channels' memberships, old groups.
+
+        A message that expired was never received, so its channel is
+        assumed dead and removed from every group, like in the in-memory
+        layer.
+        """
+        now = time.time()
+        connection.execute(
+            'DELETE FROM channel_group WHERE channel IN ('
+            ' SELECT channel FROM channel_message WHERE expires < ?)', (now,))
+        connection.execute(
+            'DELETE FROM channel_message WHERE expires < ?', (now,))
+        connection.execute(
+            'DELETE FROM channel_group WHERE joined < ?',
+            (now - self.group_expiry,))
+
+    def _queued(self, connection, channels):
+        placeholders = ', '.join('?' * len(channels))
+        return dict(connection.execute(
+            'SELECT channel, COUNT(*) FROM channel_message'
+            f' WHERE channel IN ({placeholders}) GROUP BY channel',
+            list(channels)))
+
+    def _push(self, connection, channels, body):
+        """Queue ``body`` on every channel that has room, return them."""
+        queued = self._queued(connection, channels)
+        accepted = [channel for channel in channels
+                    if queued.get(channel, 0) < self.get_capacity(channel)]
+        expires = time.time() + self.expiry
+        connection.executemany(
+            'INSERT INTO channel_message (channel, expires, body)'
+            ' VALUES (?, ?, ?)',
+            [(channel, expires, body) for channel in accepted])
+        return accepted
+
+    def _pop(self, connection, low, high, limit):
+        """Take up to ``limit`` live messages for channels in [low, high)."""
+        rows = connection.execute(
+            'SELECT id, channel, body FROM channel_message'
+            ' WHERE channel >= ? AND channel < ? AND expires >= ?'
+            ' ORDER BY id LIMIT ?', (low, high, time.time(), limit)).fetchall()
+        if rows:
+            connection.executemany(
+                'DELETE FROM channel_message WHERE id = ?',
+                [(pk,) for pk, _, _ in rows])
+        return [(channel, msgpack.unpackb(body)) for _, channel, body in rows]
+
+    # Channel layer API
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        assert self.valid_channel_name(channel), 'Channel name not valid'
+        assert '__asgi_channel__' not in message
+        body = msgpack.packb(message, use_bin_type=True)
+        if not await self._run(self._push, [channel], body):
+            raise ChannelFull(channel)
+
+    async def receive(self, channel):
+        assert self.valid_channel_name(channel)
+        if not channel.startswith(self.local_prefix):
+            return await self._receive_direct(channel)
+        self._start_reader()
+        self._receivers += 1
+        queue = self._buffers.setdefault(channel, asyncio.Queue())
+        try:
+            return await queue.get()
+        finally:
+            self._receivers -= 1
+            if queue.empty() and self._buffers.get(channel) is queue:
+                del self._buffers[channel]
+
+    async def new_channel(self, prefix='specific.'):
+        return f'{prefix}{self.client_prefix}!{_random_name()}'
+
+    @property
+    def local_prefix(self):
+        return f'specific.{self.client_prefix}!'
+
+    async def _receive_direct(self, channel):
+        delay = self.poll_interval
+        while True:
+            messages = await self._run(self._pop, channel, channel + '\0', 1)
+            if messages:
+                return messages[0][1]
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_poll_interval)
+
+    def _start_reader(self):
+        loop = asyncio.get_running_loop()
+        if self._reader is not None and self._reader.get_loop() is not loop:
+            # Queues from a previous event loop cannot be awaited here.
+            self._reader = None
+            self._buffers = {}
+        if self._reader is None or self._reader.done():
+            self._reader = loop.create_task(self._read_local())
+
+    async def _read_local(self):
+        """Move messages for this instance's channels into local queues."""
+        low = self.local_prefix
+        high = low[:-1] + chr(ord('!') + 1)
+        delay = self.poll_interval
+        while self._receivers:
+            messages = await self._run(self._pop, low, high, self.batch_size)
+            for channel, message in messages:
+                self._buffers.setdefault(
+                    channel, asyncio.Queue()).put_nowait(message)
+            if messages:
+                delay = self.poll_interval
+                continue
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_poll_interval)
+
+    # Groups extension
+
+    async def group_add(self, group, channel):
+        assert self.valid_group_name(group), 'Group name not valid'
+        assert self.valid_channel_name(channel), 'Channel name not valid'
+        await self._run(self._group_add, group, channel)
+
+    def _group_add(self, connection, group, channel):
+        connection.execute(
+            'INSERT OR REPLACE INTO channel_group (name, channel, joined)'
+            ' VALUES (?, ?, ?)', (group, channel, time.time()))
+
+    async def group_discard(self, group, channel):
+        assert self.valid_channel_name(channel), 'Invalid channel name'
+        assert self.valid_group_name(group), 'Invalid group name'
+        await self._run(self._group_discard, group, channel)
+
+    def _group_discard(self, connection, group, channel):
+        connection.execute(
+            'DELETE FROM channel_group WHERE name = ? AND channel = ?',
+            (group, channel))
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), 'Message is not a dict'
+        assert self.valid_group_name(group), 'Invalid group name'
+        body = msgpack.packb(message, use_bin_type=True)
+        await self._run(self._group_send, group, body)
+
+    def _group_send(self, connection, group, body):
+        self._clean_expired(connection)
+        channels = [channel for channel, in connection.execute(
+            'SELECT channel FROM channel_group WHERE name = ?', (group,))]
+        if channels:
+            # Full channels miss the message, as in the other layers.
+            self._push(connection, channels, body)
+
+    # Flush extension
+
+    async def flush(self):
+        await self._run(self._flush)
+        self._buffers = {}
+
+    def _flush(self, connection):
+        connection.execute('DELETE FROM channel_message')
+        connection.execute('DELETE FROM channel_group')
+
+    async def close(self):
+        pass
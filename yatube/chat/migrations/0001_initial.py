@@ -0,0 +1,23 @@
+# Generated by Django 4.1.7 on 2026-10-18 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Message',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message', models.TextField()),
+                ('username', models.CharField(max_length=10)),
+                ('pub_date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.1.7 on 2026-10-18 17:21
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='pub_date',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.1.7 on 2026-10-18 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_message_pub_date_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='room',
+            field=models.CharField(default='room', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['room', '-pub_date', '-id'], name='message_room_history'),
+        ),
+    ]
@@ -1,7 +1,27 @@
 from django.db import models
+from django.utils import timezone
+
+DEFAULT_ROOM = 'room'
 
 
 class Message(models.Model):
+    room = models.CharField(max_length=100, default=DEFAULT_ROOM)
     message = models.TextField()
     username = models.CharField(max_length=10)
-    pub_date = models.DateTimeField(auto_now_add=True)
+    # Set when the message is received: it is broadcast before the
+    # write-behind buffer (chat.buffer) saves it.
+    pub_date = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', '-pub_date', '-id'],
+                         name='message_room_history'),
+        ]
+
+    def as_dict(self):
+        """What clients get, on the socket and from the history."""
+        return {
+            'message': self.message,
+            'username': self.username,
+            'pub_date': str(self.pub_date),
+        }
@@ -0,0 +1,227 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.exceptions import ChannelFull
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.test import (SimpleTestCase, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+from django.utils import timezone
+
+from .buffer import MessageBuffer, message_buffer
+from .layers import SQLiteChannelLayer
+from .models import Message
+from .routing import websocket_urlpatterns
+
+User = get_user_model()
+
+IN_MEMORY_LAYER = {
+    'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}
+}
+
+
+class MessageBufferTests(TransactionTestCase):
+
+    def test_full_buffer_is_written_in_one_batch(self):
+        async def scenario():
+            buffer = MessageBuffer(max_size=3, interval=60)
+            for number in range(3):
+                buffer.add(Message(message=f'text {number}',
+                                   username='auth'))
+            await buffer.flush()
+            return buffer
+
+        buffer = async_to_sync(scenario)()
+        self.assertEqual(Message.objects.count(), 3)
+        self.assertIsNone(buffer._timer)
+
+    def test_pending_messages_are_written_after_interval(self):
+        async def scenario():
+            buffer = MessageBuffer(max_size=100, interval=0.01)
+            buffer.add(Message(message='text', username='auth'))
+            await asyncio.sleep(0.05)
+            await asyncio.gather(*buffer._writes)
+
+        async_to_sync(scenario)()
+        self.assertEqual(Message.objects.count(), 1)
+
+    def test_long_fields_are_cut_and_invalid_messages_dropped(self):
+        async def scenario():
+            buffer = MessageBuffer(max_size=100, interval=60)
+            self.assertTrue(buffer.add(Message(
+                message='text', username='a-very-long-username')))
+            self.assertFalse(buffer.add(Message(
+                message=None, username='auth')))
+            await buffer.flush()
+
+        with self.assertLogs('chat.buffer', 'WARNING'):
+            async_to_sync(scenario)()
+        self.assertEqual(list(Message.objects.values_list(
+            'username', flat=True)), ['a-very-lon'])
+
+    def test_failed_batch_is_saved_row_by_row(self):
+        async def scenario():
+            buffer = MessageBuffer(max_size=100, interval=60)
+            for number in range(3):
+                buffer.add(Message(message=f'text {number}',
+                                   username='auth'))
+            await buffer.flush()
+
+        with mock.patch.object(Message.objects, 'bulk_create',
+                               side_effect=IntegrityError), \
+                self.assertLogs('chat.buffer', 'ERROR'):
+            async_to_sync(scenario)()
+        self.assertEqual(Message.objects.count(), 3)
+
+    def test_pending_messages_are_saved_at_exit(self):
+        async def scenario():
+            buffer = MessageBuffer(max_size=100, interval=60)
+            buffer.add(Message(message='text', username='auth'))
+            return buffer
+
+        buffer = async_to_sync(scenario)()
+        self.assertFalse(Message.objects.exists())
+        buffer.flush_pending()
+        self.assertEqual(Message.objects.count(), 1)
+        self.assertIsNone(buffer._timer)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class ChatConsumerTests(TransactionTestCase):
+
+    def test_message_is_broadcast_and_saved(self):
+        async def scenario():
+            communicator = WebsocketCommunicator(
+                URLRouter(websocket_urlpatterns), '/ws/chat/room/')
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await communicator.send_to(text_data=json.dumps(
+                {'message': 'Привет', 'username': 'auth'}))
+            response = json.loads(await communicator.receive_from())
+            await communicator.disconnect()
+            await message_buffer.flush()
+            return response
+
+        response = async_to_sync(scenario)()
+        self.assertEqual(response['message'], 'Привет')
+        self.assertEqual(response['username'], 'auth')
+        self.assertTrue(
+            Message.objects.filter(message='Привет', room='room').exists())
+
+
+def chat_worker(path, count, ready, results):
+    """A worker process with one socket in the room."""
+    async def serve():
+        layer = SQLiteChannelLayer(path)
+        channel = await layer.new_channel()
+        await layer.group_add('chat_room', channel)
+        ready.put(channel)
+        received = [await layer.receive(channel) for _ in range(count)]
+        results.put([event['message'] for event in received])
+
+    asyncio.run(serve())
+
+
+class SQLiteChannelLayerTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'channels.sqlite3')
+
+    def test_group_send_reaches_every_worker_process(self):
+        workers, count = 4, 50
+        context = multiprocessing.get_context('fork')
+        ready, results = context.Queue(), context.Queue()
+        processes = [
+            context.Process(target=chat_worker,
+                            args=(self.path, count, ready, results))
+            for _ in range(workers)]
+        for process in processes:
+            process.start()
+        for _ in range(workers):
+            ready.get(timeout=10)
+
+        async def broadcast():
+            layer = SQLiteChannelLayer(self.path)
+            for number in range(count):
+                await layer.group_send(
+                    'chat_room', {'type': 'chat_message',
+                                  'message': f'text {number}'})
+
+        async_to_sync(broadcast)()
+        received = [results.get(timeout=30) for _ in range(workers)]
+        for process in processes:
+            process.join(timeout=10)
+        expected = [f'text {number}' for number in range(count)]
+        self.assertEqual(received, [expected] * workers)
+
+    def test_full_channel_is_skipped(self):
+        async def scenario():
+            layer = SQLiteChannelLayer(self.path, capacity=2)
+            channel = await layer.new_channel()
+            await layer.group_add('chat_room', channel)
+            for number in range(3):
+                await layer.group_send('chat_room', {'type': 'chat_message',
+                                                     'number': number})
+            with self.assertRaises(ChannelFull):
+                await layer.send(channel, {'type': 'chat_message'})
+            return [(await layer.receive(channel))['number']
+                    for _ in range(2)]
+
+        self.assertEqual(async_to_sync(scenario)(), [0, 1])
+
+    def test_expired_messages_drop_the_channel_from_groups(self):
+        async def scenario():
+            layer = SQLiteChannelLayer(self.path, expiry=-1)
+            channel = await layer.new_channel()
+            await layer.group_add('chat_room', channel)
+            await layer.send(channel, {'type': 'chat_message'})
+            await layer.group_send('chat_room', {'type': 'chat_message'})
+            return await layer._run(
+                lambda connection: connection.execute(
+                    'SELECT COUNT(*) FROM channel_group').fetchone()[0])
+
+        self.assertEqual(async_to_sync(scenario)(), 0)
+
+
+@override_settings(CHAT_HISTORY_SIZE=3)
+class ChatHistoryTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.client.force_login(self.user)
+        start = timezone.now()
+        Message.objects.bulk_create(
+            Message(room='room', message=f'text {number}', username='auth',
+                    pub_date=start + timedelta(seconds=number))
+            for number in range(5))
+        Message.objects.create(room='other', message='other room',
+                               username='auth')
+
+    def test_room_shows_latest_messages_of_the_room(self):
+        response = self.client.get(reverse('chat:chat'))
+        self.assertEqual(
+            [message['message'] for message in response.context['messages']],
+            ['text 2', 'text 3', 'text 4'])
+        self.assertIsNotNone(response.context['older_cursor'])
+
+    def test_history_loads_older_messages(self):
+        cursor = self.client.get(
+            reverse('chat:chat')).context['older_cursor']
+        data = self.client.get(
+            reverse('chat:history', kwargs={'room_name': 'room'}),
+            {'cursor': cursor}).json()
+        self.assertEqual(
+            [message['message'] for message in data['messages']],
+            ['text 0', 'text 1'])
+        self.assertIsNone(data['older_cursor'])
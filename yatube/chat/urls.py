@@ -1,4 +1,4 @@
-from django.urls import path
+from django.urls import path, re_path
 
 from . import views
 
@@ -6,4 +6,7 @@ app_name = 'chat'
 
 urlpatterns = [
     path('room/', views.room, name='chat'),
+    re_path(r'^room/(?P<room_name>\w+)/$', views.room, name='room'),
+    re_path(r'^room/(?P<room_name>\w+)/history/$', views.history,
+            name='history'),
 ]
@@ -1,17 +1,36 @@
-from django.core import serializers
-from django.shortcuts import render
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import render
 
-from .models import Message
+from core.paginator import CursorPaginator
+from .models import DEFAULT_ROOM, Message
 
 
-@login_required
-def room(request):
-    messages = Message.objects.all()
-    data = serializers.serialize("json", messages)
+def history_page(room_name, cursor=None):
+    """Page of a room's history, newest first; next_cursor goes older."""
+    paginator = CursorPaginator(
+        Message.objects.filter(room=room_name),
+        settings.CHAT_HISTORY_SIZE,
+        ordering=('-pub_date', '-pk'))
+    return paginator.get_page(cursor)
 
-    context = {
-        'messages': data,
 
+@login_required
+def room(request, room_name=DEFAULT_ROOM):
+    page = history_page(room_name)
+    context = {
+        'room_name': room_name,
+        'messages': [message.as_dict() for message in reversed(page)],
+        'older_cursor': page.next_cursor,
     }
     return render(request, 'chat/room.html', context)
+
+
+@login_required
+def history(request, room_name):
+    page = history_page(room_name, request.GET.get('cursor'))
+    return JsonResponse({
+        'messages': [message.as_dict() for message in reversed(page)],
+        'older_cursor': page.next_cursor,
+    })
@@ -0,0 +1,91 @@
+import time
+
+from django.core.cache import InvalidCacheBackendError, cache, caches
+from django.core.cache.utils import make_template_fragment_key
+
+
+def fragment_cache():
+    """The cache {% cache %} writes to, picked the way the tag does."""
+    try:
+        return caches['template_fragments']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def delete_fragment(fragment_name, vary_on=None):
+    fragment_cache().delete(
+        make_template_fragment_key(fragment_name, vary_on))
+
+
+def delete_fragments(fragment_name, vary_ons):
+    """Delete many versions of a fragment in one round trip."""
+    fragment_cache().delete_many([
+        make_template_fragment_key(fragment_name, vary_on)
+        for vary_on in vary_ons])
+
+
+def _generation_key(namespace):
+    return f'generation:{namespace}'
+
+
+def _modified_key(namespace):
+    # Under the generation prefix, so it bypasses local cache tiers too.
+    return f'generation:{namespace}:modified'
+
+
+def _new_generation():
+    # Not 1: after an eviction the counter must not restart at a value
+    # that old fragments were keyed on.
+    return time.time_ns() // 1000
+
+
+def get_generations(*namespaces):
+    """Current generations of ``namespaces``, in one cache round trip.
+
+    Put them into cache keys: bumping a namespace orphans every entry
+    built on its previous generation, so entries can live long and still
+    never be served stale.
+    """
+    keys = [_generation_key(namespace) for namespace in namespaces]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, _new_generation(), timeout=None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+
+def get_generation(namespace):
+    return get_generations(namespace)[0]
+
+
+def get_validators(*namespaces):
+    """Generations of ``namespaces`` and the time (whole seconds) of
+    their latest bump, in one cache round trip.
+
+    A namespace never bumped since its stamp was lost counts as changed
+    now: a Last-Modified may be too new, never too old.
+    """
+    keys = [_modified_key(namespace) for namespace in namespaces]
+    values = cache.get_many(
+        [*keys, *(_generation_key(namespace) for namespace in namespaces)])
+    for key in keys:
+        if key not in values:
+            cache.add(key, int(time.time()), timeout=None)
+            values[key] = cache.get(key)
+    generations = [values.get(_generation_key(namespace))
+                   for namespace in namespaces]
+    if None in generations:
+        generations = get_generations(*namespaces)
+    return generations, max(values[key] for key in keys)
+
+
+def bump_generation(*namespaces):
+    now = int(time.time())
+    for namespace in namespaces:
+        key = _generation_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_generation(), timeout=None)
+        cache.set(_modified_key(namespace), now, timeout=None)
@@ -0,0 +1,268 @@
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+_MISSING = object()
+
+
+class TwoTierCache(BaseCache):
+    """Small per-process LRU in front of a shared cache.
+
+    Reads are served from the local tier when possible, writes go to both
+    tiers, and counters are always changed in the shared tier. Another
+    process sees a change once its local copy expires, after at most
+    ``LOCAL_TIMEOUT`` seconds; keys starting with one of
+    ``BYPASS_PREFIXES`` skip the local tier and are always current.
+
+    OPTIONS: SHARED (alias of the shared cache), LOCAL_TIMEOUT,
+    LOCAL_MAX_ENTRIES, BYPASS_PREFIXES.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self._bypass = tuple(options.get('BYPASS_PREFIXES', ()))
+        self._local = LocMemCache(f'two-tier-{location}', {
+            'TIMEOUT': self._local_timeout,
+            'OPTIONS': {
+                'MAX_ENTRIES': options.get('LOCAL_MAX_ENTRIES', 300)},
+        })
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _cached_locally(self, key):
+        return not key.startswith(self._bypass)
+
+    def _local_ttl(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self._local_timeout
+        return min(timeout, self._local_timeout)
+
+    def _remember(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        data = {key: value for key, value in data.items()
+                if self._cached_locally(key)}
+        if data:
+            self._local.set_many(data, self._local_ttl(timeout), version)
+
+    def get(self, key, default=None, version=None):
+        if self._cached_locally(key):
+            value = self._local.get(key, _MISSING, version)
+            if value is not _MISSING:
+                return value
+        value = self.shared.get(key, _MISSING, version)
+        if value is _MISSING:
+            return default
+        self._remember({key: value}, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = self._local.get_many(
+            [key for key in keys if self._cached_locally(key)], version)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            fetched = self.shared.get_many(missing, version)
+            self._remember(fetched, version=version)
+            found.update(fetched)
+        return found
+
+    def has_key(self, key, version=None):
+        return (self._cached_locally(key)
+                and self._local.has_key(key, version)
+                or self.shared.has_key(key, version))
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self._remember({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        self._remember({key: value for key, value in data.items()
+                        if key not in failed}, timeout, version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self._remember({key: value}, timeout, version)
+        else:
+            self._local.delete(key, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local.delete(key, version)
+        return self.shared.touch(key, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local.delete(key, version)
+        return self.shared.incr(key, delta, version)
+
+    def delete(self, key, version=None):
+        self._local.delete(key, version)
+        return self.shared.delete(key, version)
+
+    def delete_many(self, keys, version=None):
+        self._local.delete_many(keys, version)
+        self.shared.delete_many(keys, version)
+
+    def clear(self):
+        self._local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+
+class StaleWhileRevalidateCache(BaseCache):
+    """Single-flight recomputation and stale-while-revalidate in front of
+    another cache, through the plain get/set protocol.
+
+    Values are stored with the time they go stale and are kept
+    ``STALE_TIMEOUT`` seconds past it. A ``get`` that returns ``default``
+    is a promise to recompute and ``set`` (or ``delete``) the key, so
+    callers such as the ``{% cache %}`` tag or ``get_or_set`` need no
+    changes:
+
+    * a fresh value is returned;
+    * a stale value makes the first caller take a refresh lock and get
+      ``default``, while everybody else keeps getting the stale value;
+    * a missing value makes the first caller take the lock, the others
+      wait up to ``LOCK_WAIT`` seconds for its ``set`` and only then
+      recompute themselves.
+
+    A lock expires after ``LOCK_TIMEOUT`` seconds in case its holder dies,
+    and ``set`` and ``delete`` release only the locks this cache instance
+    took (Django gives every thread its own instance). With ``LOCK_WAIT``
+    0 the others recompute a missing value at once: single flight then
+    covers stale values only.
+
+    OPTIONS: TARGET (alias of the cache holding the values),
+    STALE_TIMEOUT, LOCK_TIMEOUT, LOCK_WAIT, POLL_INTERVAL.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._target_alias = options.get('TARGET', 'default')
+        self.stale_timeout = options.get('STALE_TIMEOUT', 300)
+        self.lock_timeout = options.get('LOCK_TIMEOUT', 30)
+        self.lock_wait = options.get('LOCK_WAIT', 2)
+        self.poll_interval = options.get('POLL_INTERVAL', 0.05)
+        # (key, version) of the locks taken here, with their expiry.
+        self._held = {}
+
+    @property
+    def target(self):
+        return caches[self._target_alias]
+
+    @staticmethod
+    def _lock_key(key):
+        return f'{key}:refresh'
+
+    def _acquire(self, key, version):
+        acquired = self.target.add(self._lock_key(key), 1,
+                                   self.lock_timeout, version)
+        if acquired:
+            self._held[key, version] = time.monotonic() + self.lock_timeout
+        return acquired
+
+    def _release(self, key, version):
+        expires = self._held.pop((key, version), None)
+        # An expired lock may have been taken by someone else since.
+        if expires is not None and time.monotonic() < expires:
+            self.target.delete(self._lock_key(key), version)
+
+    def _envelope(self, value, timeout):
+        """``(value, stale_at)`` and the timeout to store it with."""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return (value, None), None
+        return (value, time.time() + timeout), max(
+            timeout, 0) + self.stale_timeout
+
+    def _wait(self, key, default, version):
+        deadline = time.monotonic() + self.lock_wait
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            envelope = self.target.get(key, None, version)
+            if envelope is not None:
+                return envelope[0]
+        return default
+
+    def get(self, key, default=None, version=None):
+        envelope = self.target.get(key, None, version)
+        if envelope is None:
+            if self._acquire(key, version):
+                return default
+            return self._wait(key, default, version)
+        value, stale_at = envelope
+        if stale_at is not None and stale_at <= time.time() and (
+                self._acquire(key, version)):
+            return default
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        for key in keys:
+            value = self.get(key, _MISSING, version)
+            if value is not _MISSING:
+                found[key] = value
+        return found
+
+    def has_key(self, key, version=None):
+        return self.target.has_key(key, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        envelope, timeout = self._envelope(value, timeout)
+        self.target.set(key, envelope, timeout, version)
+        self._release(key, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        for key, value in data.items():
+            self.set(key, value, timeout, version)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        envelope, timeout = self._envelope(value, timeout)
+        return self.target.add(key, envelope, timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        envelope = self.target.get(key, None, version)
+        if envelope is None:
+            return False
+        self.set(key, envelope[0], timeout, version)
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        envelope = self.target.get(key, None, version)
+        if envelope is None:
+            raise ValueError("Key '%s' not found" % key)
+        value = envelope[0] + delta
+        self.target.set(key, (value, envelope[1]),
+                        self._remaining(envelope), version)
+        return value
+
+    def _remaining(self, envelope):
+        if envelope[1] is None:
+            return None
+        return max(envelope[1] - time.time(), 0) + self.stale_timeout
+
+    def delete(self, key, version=None):
+        self._release(key, version)
+        return self.target.delete(key, version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self.delete(key, version)
+
+    def clear(self):
+        self.target.clear()
+
+    def close(self, **kwargs):
+        self.target.close(**kwargs)
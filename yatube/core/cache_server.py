@@ -0,0 +1,200 @@
+"""Minimal Redis-protocol cache server.
+
+A local stand-in for Redis: it speaks enough RESP for Django's
+``RedisCache`` (strings with expiry, counters, MGET/MSET, MULTI/EXEC),
+so several workers on one host can share a cache without installing
+Redis, and tests can run the redis backend against a real socket.
+Everything lives in memory and is lost on restart.
+
+    python manage.py cacheserver --port 6379
+"""
+import socketserver
+import threading
+import time
+
+
+class CommandError(Exception):
+    pass
+
+
+class Status(bytes):
+    """Simple string reply, e.g. +OK."""
+
+
+OK = Status(b'OK')
+QUEUED = Status(b'QUEUED')
+
+
+class Store:
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        value, expires = self._data.get(key, (None, None))
+        if expires is not None and expires <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def execute(self, name, args):
+        handler = getattr(self, 'cmd_' + name.lower(), None)
+        if handler is None:
+            raise CommandError(f"unknown command '{name}'")
+        with self._lock:
+            return handler(*args)
+
+    def cmd_ping(self, *args):
+        return args[0] if args else Status(b'PONG')
+
+    def cmd_select(self, db):
+        return OK
+
+    def cmd_get(self, key):
+        return self._live(key)
+
+    def cmd_mget(self, *keys):
+        return [self._live(key) for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        expires = None
+        for unit, scale in ((b'EX', 1), (b'PX', 0.001)):
+            if unit in options:
+                seconds = int(options[options.index(unit) + 1]) * scale
+                expires = time.monotonic() + seconds
+        exists = self._live(key) is not None
+        if (b'NX' in options and exists) or (b'XX' in options
+                                             and not exists):
+            return None
+        self._data[key] = (value, expires)
+        return OK
+
+    def cmd_mset(self, *pairs):
+        for key, value in zip(pairs[::2], pairs[1::2]):
+            self._data[key] = (value, None)
+        return OK
+
+    def cmd_del(self, *keys):
+        deleted = 0
+        for key in keys:
+            if self._live(key) is not None:
+                del self._data[key]
+                deleted += 1
+        return deleted
+
+    def cmd_exists(self, *keys):
+        return sum(self._live(key) is not None for key in keys)
+
+    def cmd_expire(self, key, seconds):
+        value = self._live(key)
+        if value is None:
+            return 0
+        self._data[key] = (value, time.monotonic() + int(seconds))
+        return 1
+
+    def cmd_persist(self, key):
+        value = self._live(key)
+        if value is None or self._data[key][1] is None:
+            return 0
+        self._data[key] = (value, None)
+        return 1
+
+    def cmd_incrby(self, key, delta):
+        value = self._live(key)
+        try:
+            value = int(value or 0) + int(delta)
+        except ValueError:
+            raise CommandError('value is not an integer or out of range')
+        expires = self._data.get(key, (None, None))[1]
+        self._data[key] = (str(value).encode(), expires)
+        return value
+
+    def cmd_incr(self, key):
+        return self.cmd_incrby(key, 1)
+
+    def cmd_flushdb(self, *args):
+        self._data.clear()
+        return OK
+
+    cmd_flushall = cmd_flushdb
+
+
+class RESPHandler(socketserver.StreamRequestHandler):
+
+    def read_command(self):
+        header = self.rfile.readline()
+        if not header:
+            return None
+        if not header.startswith(b'*'):
+            return header.split()
+        args = []
+        for _ in range(int(header[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def encode(self, reply):
+        if isinstance(reply, CommandError):
+            return b'-ERR %s\r\n' % str(reply).encode()
+        if reply is None:
+            return b'$-1\r\n'
+        if isinstance(reply, int):
+            return b':%d\r\n' % reply
+        if isinstance(reply, Status):
+            return b'+%s\r\n' % reply
+        if isinstance(reply, list):
+            return b'*%d\r\n' % len(reply) + b''.join(
+                self.encode(item) for item in reply)
+        return b'$%d\r\n%s\r\n' % (len(reply), reply)
+
+    def execute(self, name, args):
+        try:
+            return self.server.store.execute(name, args)
+        except (CommandError, TypeError) as error:
+            return CommandError(str(error))
+
+    def reply(self, name, args):
+        """Run one command, queueing it inside MULTI ... EXEC."""
+        if name == 'MULTI':
+            self.queued = []
+            return OK
+        if name == 'DISCARD':
+            self.queued = None
+            return OK
+        if name == 'EXEC' and self.queued is not None:
+            queued, self.queued = self.queued, None
+            return [self.execute(*command) for command in queued]
+        if self.queued is not None:
+            self.queued.append((name, args))
+            return QUEUED
+        return self.execute(name, args)
+
+    def handle(self):
+        self.queued = None
+        while True:
+            command = self.read_command()
+            if not command:
+                break
+            reply = self.reply(command[0].decode().upper(), command[1:])
+            self.wfile.write(self.encode(reply))
+
+
+class CacheServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address):
+        super().__init__(address, RESPHandler)
+        self.store = Store()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'redis://{host}:{port}/0'
+
+    def start(self):
+        """Serve from a daemon thread, e.g. in tests."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,66 @@
+"""Conditional GET for public pages.
+
+``conditional_page`` validates a page against the generations of the
+cache namespaces it shows (see core.cache): its ETag hashes the full
+path and those generations, and its ``Last-Modified`` is the time of
+their latest bump. Signals bump the namespaces on every change, so
+validating costs one cache round trip, plus whatever ``namespaces``
+spends resolving a slug. A matching request gets a 304 and the view
+does not run.
+
+Only anonymous GET and HEAD requests are validated. Their responses are
+``public`` with ``PAGE_CACHE_MAX_AGE`` and ``must-revalidate``, so a
+reverse proxy can keep one copy and revalidate it cheaply. Reading
+``request.user`` loads the session, so ``SessionMiddleware`` adds
+``Vary: Cookie``: visitors with a session cookie never get the shared
+copy. Pages of logged-in users are ``private``.
+
+Rendered pages carry the generations they were validated with, which is
+what lets core.middleware cache them whole.
+"""
+import hashlib
+from datetime import date
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .cache import get_validators
+
+
+def conditional_page(namespaces):
+    """Decorate a view. ``namespaces(request, *args, **kwargs)`` returns
+    the namespaces the page shows, or None to skip validation (e.g. for
+    a page that will be a 404)."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or (
+                    request.user.is_authenticated):
+                response = view(request, *args, **kwargs)
+                patch_cache_control(response, private=True)
+                return response
+            names = namespaces(request, *args, **kwargs)
+            if names is None:
+                return view(request, *args, **kwargs)
+            generations, last_modified = get_validators(*names)
+            # The footer shows the year.
+            etag = quote_etag(hashlib.sha1(repr((
+                request.get_full_path(), generations, date.today().year,
+            )).encode()).hexdigest())
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                # For AnonymousPageCacheMiddleware (core.middleware).
+                response.cache_namespaces = dict(zip(names, generations))
+            response.headers['ETag'] = etag
+            response.headers['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, public=True, must_revalidate=True,
+                                max_age=settings.PAGE_CACHE_MAX_AGE)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.cache_server import CacheServer
+
+
+class Command(BaseCommand):
+    help = ('Run the in-memory Redis-protocol cache server, a local '
+            'stand-in for Redis shared by all workers on this host.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=6379)
+
+    def handle(self, *args, **options):
+        with CacheServer((options['host'], options['port'])) as server:
+            self.stdout.write(f'Serving cache on {server.url}')
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
@@ -0,0 +1,129 @@
+"""Whole-page cache for anonymous visitors.
+
+``AnonymousPageCacheMiddleware`` sits above the session and auth
+middleware. A GET or HEAD without a session or messages cookie is
+looked up by its full path, and neither the session, auth, ORM nor
+templates are touched on a hit.
+
+Pages are stored under their path plus the generations they were
+rendered with (see core.conditional). A short pointer under the path
+alone remembers which namespaces the page shows. A lookup reads the
+pointer, the current generations of those namespaces, and the page for
+them: three cache round trips. Any bump moves the lookup to a new key,
+so an invalidated page is never served.
+
+Both keys live in the ``pages`` cache, a StaleWhileRevalidateCache (see
+core.cache_backends). Of concurrent misses only one request renders and
+the others wait for it. Expired pages keep being served while one
+request refreshes them, which is safe because a page under a given set
+of generations cannot change. Only 200 responses that carry
+generations and set no cookies are stored.
+
+Hits and misses are counted in the cache (``stats``) and reported in
+the ``X-Page-Cache`` header.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, cache, caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .cache import get_generations
+
+STATS_KEYS = {'hit': 'page_cache:hits', 'miss': 'page_cache:misses'}
+
+
+def page_cache():
+    try:
+        return caches['pages']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def page_key(request):
+    path = hashlib.sha1(request.get_full_path().encode()).hexdigest()
+    return f'page_cache:{path}'
+
+
+def _versioned_key(key, generations):
+    digest = hashlib.sha1(repr(sorted(generations.items())).encode())
+    return f'{key}:{digest.hexdigest()}'
+
+
+def stats():
+    values = cache.get_many(STATS_KEYS.values())
+    return {name: values.get(key, 0) for name, key in STATS_KEYS.items()}
+
+
+def _count(outcome):
+    key = STATS_KEYS[outcome]
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+class AnonymousPageCacheMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def cacheable(self, request):
+        return request.method in ('GET', 'HEAD') and not (
+            settings.SESSION_COOKIE_NAME in request.COOKIES
+            or 'messages' in request.COOKIES)
+
+    def __call__(self, request):
+        if not self.cacheable(request):
+            return self.get_response(request)
+        pages = page_cache()
+        key = page_key(request)
+        # Every None below means this request holds the refresh lock.
+        pending = [key]
+        namespaces = pages.get(key)
+        if namespaces is not None:
+            versioned = _versioned_key(key, dict(zip(
+                namespaces, get_generations(*namespaces))))
+            entry = pages.get(versioned)
+            if entry is not None:
+                return self.respond(request, entry)
+            pending = [versioned]
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            pages.delete_many(pending)
+            raise
+        if not self.store(pages, key, response):
+            pages.delete_many(pending)
+        _count('miss')
+        response.headers['X-Page-Cache'] = 'miss'
+        return response
+
+    def store(self, pages, key, response):
+        generations = getattr(response, 'cache_namespaces', None)
+        if (generations is None or response.status_code != 200
+                or response.cookies or response.streaming):
+            return False
+        pages.set_many({
+            _versioned_key(key, generations): {
+                'headers': dict(response.headers),
+                'content': response.content,
+            },
+            key: sorted(generations),
+        }, settings.PAGE_CACHE_TIMEOUT)
+        return True
+
+    def respond(self, request, entry):
+        _count('hit')
+        headers = entry['headers']
+        response = HttpResponse(entry['content'], headers=headers)
+        response = get_conditional_response(
+            request, etag=headers.get('ETag'),
+            last_modified=parse_http_date_safe(
+                headers.get('Last-Modified', '')),
+            response=response) or response
+        response.headers['X-Page-Cache'] = 'hit'
+        return response
@@ -0,0 +1,189 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CountedPaginator(Paginator):
+    """Numbered paginator that takes the total from outside.
+
+    ``count`` is a number or a callable returning it (called once, lazily),
+    e.g. a maintained counter, instead of ``object_list.count()``.
+    """
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count = count
+
+    @cached_property
+    def count(self):
+        return self._count() if callable(self._count) else self._count
+
+
+class CursorPage(Page):
+    """Page of a keyset paginator. Addressed by cursors, not by numbers.
+
+    Rows are fetched on first use, so a page whose rendering is served
+    from a fragment cache keyed on it costs no query.
+    """
+
+    number = None
+
+    def __init__(self, paginator, cursor=None, seek=None):
+        self.paginator = paginator
+        self.cursor = cursor
+        self._seek = seek
+
+    def __repr__(self):
+        return '<CursorPage %s>' % (self.cursor or 'first')
+
+    @cached_property
+    def _window(self):
+        return self.paginator.fetch(*(self._seek or (False, None)))
+
+    @property
+    def object_list(self):
+        return self._window[0]
+
+    @property
+    def next_cursor(self):
+        return self._window[1]
+
+    @property
+    def previous_cursor(self):
+        return self._window[2]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def next_page_number(self):
+        raise InvalidPage('Cursor pages have no numbers, use next_cursor')
+
+    def previous_page_number(self):
+        raise InvalidPage(
+            'Cursor pages have no numbers, use previous_cursor')
+
+    def start_index(self):
+        raise InvalidPage('Cursor pages have no absolute position')
+
+    def end_index(self):
+        raise InvalidPage('Cursor pages have no absolute position')
+
+
+class CursorPaginator(Paginator):
+    """Keyset (seek) paginator.
+
+    Every page is fetched with ``WHERE (ordering) < (cursor) LIMIT n + 1``,
+    so it costs one indexed range scan no matter how deep it is, and no
+    ``COUNT(*)`` is ever issued. ``ordering`` must be unique over the
+    queryset, that is why it ends with the primary key. It may name
+    annotations, e.g. columns of a joined table to seek on.
+    """
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-pk')):
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.ordering = tuple(ordering)
+        self._fields = [self._field(object_list, name.lstrip('-'))
+                        for name in self.ordering]
+
+    @staticmethod
+    def _field(queryset, name):
+        """``(attribute, field)`` of an ordering name: a model field,
+        ``pk`` or an annotation of ``queryset``."""
+        if name in queryset.query.annotations:
+            return name, queryset.query.annotations[name].output_field
+        meta = queryset.model._meta
+        field = meta.pk if name == 'pk' else meta.get_field(name)
+        return field.attname, field
+
+    def encode_cursor(self, obj, reverse=False):
+        values = []
+        for attribute, _ in self._fields:
+            value = getattr(obj, attribute)
+            # As Field.value_to_string does.
+            values.append(value.isoformat() if hasattr(value, 'isoformat')
+                          else str(value))
+        payload = json.dumps([int(reverse), values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(
+            payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = base64.urlsafe_b64decode(
+                cursor + '=' * (-len(cursor) % 4))
+            reverse, values = json.loads(payload)
+            if len(values) != len(self._fields):
+                raise ValueError
+            values = [field.to_python(value)
+                      for (_, field), value in zip(self._fields, values)]
+        except (binascii.Error, TypeError, ValueError, ValidationError):
+            raise InvalidCursor('That cursor is not valid')
+        return bool(reverse), values
+
+    def _order_by(self, reverse):
+        ordering = []
+        for name in self.ordering:
+            descending = name.startswith('-') != reverse
+            ordering.append(('-' if descending else '') + name.lstrip('-'))
+        return ordering
+
+    def _seek(self, values, reverse):
+        """Lexicographic "comes after the cursor" condition."""
+        condition = Q()
+        for position, name in enumerate(self.ordering):
+            descending = name.startswith('-') != reverse
+            lookup = '%s__%s' % (name.lstrip('-'), 'lt' if descending
+                                 else 'gt')
+            step = Q(**{lookup: values[position]})
+            for prefix, value in zip(self.ordering[:position], values):
+                step &= Q(**{prefix.lstrip('-'): value})
+            condition |= step
+        # Redundant, but an index can range-scan a bound on the leading
+        # column and not the OR above.
+        first = self.ordering[0]
+        descending = first.startswith('-') != reverse
+        bound = '%s__%s' % (first.lstrip('-'), 'lte' if descending else 'gte')
+        return Q(**{bound: values[0]}) & condition
+
+    def fetch(self, reverse, values):
+        """Return ``(rows, next_cursor, previous_cursor)``."""
+        queryset = self.object_list.order_by(*self._order_by(reverse))
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, reverse))
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if reverse:
+            object_list.reverse()
+            has_next, has_previous = values is not None, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        next_cursor = previous_cursor = None
+        if object_list and has_next:
+            next_cursor = self.encode_cursor(object_list[-1])
+        if object_list and has_previous:
+            previous_cursor = self.encode_cursor(object_list[0], reverse=True)
+        return object_list, next_cursor, previous_cursor
+
+    def page(self, cursor=None):
+        seek = self.decode_cursor(cursor) if cursor else None
+        return CursorPage(self, cursor, seek)
+
+    def get_page(self, cursor=None):
+        """Like Paginator.get_page: a broken cursor gives the first page."""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
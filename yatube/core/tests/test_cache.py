@@ -0,0 +1,154 @@
+import time
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+
+from core import cache_backends
+from core.cache_server import CacheServer
+
+
+class SharedCacheTests(SimpleTestCase):
+    """Redis backend and the two-tier cache against the local stand-in."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = CacheServer(('127.0.0.1', 0))
+        cls.server.start()
+        redis = {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': cls.server.url,
+        }
+
+        def two_tier(location):
+            return {
+                'BACKEND': 'core.cache_backends.TwoTierCache',
+                'LOCATION': location,
+                'OPTIONS': {'SHARED': 'shared', 'LOCAL_TIMEOUT': 60,
+                            'BYPASS_PREFIXES': ('generation:',)},
+            }
+
+        cls.settings_override = override_settings(CACHES={
+            'default': redis,
+            'shared': redis,
+            'worker_1': two_tier('worker-1'),
+            'worker_2': two_tier('worker-2'),
+        })
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        for alias in ('shared', 'worker_1', 'worker_2'):
+            caches[alias].clear()
+
+    def test_redis_backend_round_trip(self):
+        cache = caches['shared']
+        cache.set('post', {'text': 'Тестовый пост'}, 30)
+        self.assertEqual(cache.get('post'), {'text': 'Тестовый пост'})
+        self.assertFalse(cache.add('post', 'other'))
+        cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+        self.assertEqual(cache.incr('a', 10), 11)
+        cache.delete_many(['a', 'b'])
+        self.assertIsNone(cache.get('a'))
+        cache.set('expired', 1, 0)
+        self.assertIsNone(cache.get('expired'))
+
+    def test_workers_share_one_cache(self):
+        caches['worker_1'].set('page', 'rendered')
+        self.assertEqual(caches['worker_2'].get('page'), 'rendered')
+
+    def test_local_tier_serves_repeated_reads(self):
+        worker = caches['worker_1']
+        caches['shared'].set('page', 'rendered')
+        self.assertEqual(worker.get('page'), 'rendered')
+        caches['shared'].delete('page')
+        self.assertEqual(worker.get('page'), 'rendered')
+
+    def test_counters_and_bypassed_keys_are_current(self):
+        caches['worker_1'].set('generation:feed', 1)
+        caches['worker_1'].set('hits', 1)
+        self.assertEqual(caches['worker_2'].get('generation:feed'), 1)
+        caches['worker_1'].incr('generation:feed')
+        self.assertEqual(caches['worker_2'].get('generation:feed'), 2)
+        self.assertEqual(caches['worker_1'].incr('hits'), 2)
+        self.assertEqual(caches['worker_1'].get('hits'), 2)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'swr-target'},
+    'template_fragments': {
+        'BACKEND': 'core.cache_backends.StaleWhileRevalidateCache',
+        'OPTIONS': {'TARGET': 'default', 'STALE_TIMEOUT': 60,
+                    'LOCK_WAIT': 1, 'POLL_INTERVAL': 0},
+    },
+})
+class StaleWhileRevalidateTests(SimpleTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.cache = caches['template_fragments']
+
+    def expire(self, key):
+        value, _ = caches['default'].get(key)
+        caches['default'].set(key, (value, time.time() - 1))
+
+    def test_fresh_value_is_returned(self):
+        self.cache.set('page', 'v1', 30)
+        self.assertEqual(self.cache.get('page'), 'v1')
+        self.assertEqual(self.cache.get_many(['page', 'other']),
+                         {'page': 'v1'})
+
+    def test_one_caller_refreshes_others_get_stale(self):
+        self.cache.set('page', 'v1', 30)
+        self.expire('page')
+        self.assertIsNone(self.cache.get('page'))
+        self.assertEqual(self.cache.get('page'), 'v1')
+        self.cache.set('page', 'v2', 30)
+        self.assertEqual(self.cache.get('page'), 'v2')
+
+    def test_concurrent_misses_wait_for_the_first(self):
+        self.assertIsNone(self.cache.get('page'))
+        with mock.patch.object(
+                cache_backends.time, 'sleep',
+                side_effect=lambda _: self.cache.set('page', 'v1', 30)):
+            self.assertEqual(self.cache.get('page'), 'v1')
+
+    def test_waiting_gives_up(self):
+        self.assertIsNone(self.cache.get('page'))
+        with mock.patch.object(self.cache, 'lock_wait', 0):
+            self.assertEqual(self.cache.get('page', 'default'), 'default')
+
+    def test_delete_releases_the_lock(self):
+        self.assertIsNone(self.cache.get('page'))
+        self.cache.delete('page')
+        self.assertIsNone(self.cache.get('page'))
+
+    def test_only_the_lock_holder_releases_it(self):
+        # Another process is rendering the page.
+        caches['default'].add('page:refresh', 1)
+        self.cache.set('page', 'v1', 30)
+        self.cache.delete('page')
+        self.assertTrue(caches['default'].has_key('page:refresh'))
+
+    def test_cache_tag_renders_once_while_stale(self):
+        template = Template(
+            '{% load cache %}{% cache 30 block %}{{ value }}{% endcache %}')
+        self.assertEqual(template.render(Context({'value': 1})), '1')
+        key = make_template_fragment_key('block')
+        self.expire(key)
+        # The first request re-renders, the next one gets the stale copy.
+        self.assertEqual(template.render(Context({'value': 2})), '2')
+        self.expire(key)
+        self.cache.get(key)
+        self.assertEqual(template.render(Context({'value': 3})), '2')
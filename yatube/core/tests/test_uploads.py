@@ -0,0 +1,84 @@
+import io
+import os
+
+from django import forms
+from django.core.exceptions import RequestDataTooBig
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from PIL import Image
+
+from core.uploads import bounded_uploads, check_image
+
+
+class ImageForm(forms.Form):
+    image = forms.ImageField()
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        check_image(image)
+        return image
+
+
+@bounded_uploads
+def upload_view(request):
+    return HttpResponse(request.FILES['image'].size)
+
+
+def png(width, height, mode='RGB'):
+    buffer = io.BytesIO()
+    Image.new(mode, (width, height)).save(buffer, 'PNG')
+    return SimpleUploadedFile('image.png', buffer.getvalue(),
+                              content_type='image/png')
+
+
+@override_settings(UPLOAD_MAX_BYTES=1024, UPLOAD_MAX_PIXELS=10 ** 6)
+class BoundedUploadTests(SimpleTestCase):
+
+    def upload(self, file):
+        request = RequestFactory().post('/', {'image': file})
+        return ImageForm(files=request.FILES)
+
+    def test_small_image_is_accepted(self):
+        form = self.upload(png(20, 20))
+        self.assertTrue(form.is_valid(), form.errors)
+
+    def test_file_over_the_byte_limit_is_rejected(self):
+        noise = Image.frombytes('RGB', (40, 40), os.urandom(40 * 40 * 3))
+        buffer = io.BytesIO()
+        noise.save(buffer, 'PNG')
+        form = self.upload(SimpleUploadedFile(
+            'noise.png', buffer.getvalue(), content_type='image/png'))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code, 'too_large')
+
+    def test_bounded_view_refuses_the_request_past_the_limit(self):
+        request = RequestFactory().post('/', {'image': SimpleUploadedFile(
+            'noise.png', b'x' * 4096, content_type='image/png')})
+        request._dont_enforce_csrf_checks = True
+        with self.assertRaises(RequestDataTooBig):
+            upload_view(request)
+        request = RequestFactory().post('/', {'image': png(20, 20)})
+        request._dont_enforce_csrf_checks = True
+        self.assertEqual(int(upload_view(request).content),
+                         len(png(20, 20).read()))
+
+    def test_bounded_view_still_checks_csrf(self):
+        request = RequestFactory().post('/', {'image': png(20, 20)})
+        self.assertTrue(upload_view.csrf_exempt)
+        with self.assertTemplateUsed('core/403csrf.html'):
+            upload_view(request)
+
+    def test_pixel_limit_is_checked_from_the_header(self):
+        # A few hundred bytes on disk, 4 megapixels once decoded.
+        form = self.upload(png(2000, 2000, mode='1'))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
+
+    @override_settings(UPLOAD_MAX_BYTES=10 ** 6, UPLOAD_MAX_PIXELS=10 ** 9)
+    def test_decompression_bomb_is_rejected(self):
+        form = self.upload(png(10000, 10000, mode='1'))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
@@ -0,0 +1,105 @@
+"""Bounded image uploads.
+
+Views that take images are wrapped in ``bounded_uploads``, which swaps
+the request's upload handlers for ``BoundedUploadHandler`` alone; other
+views keep Django's defaults. The handler streams every uploaded file
+to a temporary file in chunks, whatever its size, and raises
+``RequestDataTooBig`` (a 400 response) as soon as one passes
+``UPLOAD_MAX_BYTES``, so nothing past the limit is written.
+
+``check_image``, called from ``PostForm.clean_image``, rejects oversized
+files and checks the dimensions from the image header with Pillow's
+decompression bomb warning turned into an error, so a bomb is refused
+without being decoded; Django's ``ImageField`` before it only opens and
+verifies the file, which does not decode it either. Originals that pass
+but are large are scaled down later by the thumbnail worker
+(posts.derivatives).
+"""
+import warnings
+from functools import wraps
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig, ValidationError
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from django.utils.translation import gettext_lazy as _
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image
+
+
+class BoundedUploadHandler(TemporaryFileUploadHandler):
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.UPLOAD_MAX_BYTES:
+            raise RequestDataTooBig(
+                'An uploaded file exceeded settings.UPLOAD_MAX_BYTES.')
+        return super().receive_data_chunk(raw_data, start)
+
+
+def bounded_uploads(view):
+    """Parse the uploads of ``view`` with ``BoundedUploadHandler``.
+
+    Handlers must be set before the body is read, and the CSRF check
+    reads it, so the check runs inside, after the swap.
+    """
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [BoundedUploadHandler(request)]
+        return protected(request, *args, **kwargs)
+
+    return wrapper
+
+
+ERROR_MESSAGES = {
+    'too_large': _('The file is larger than %(limit)s.'),
+    'too_many_pixels': _('The image is larger than %(limit)s megapixels.'),
+    'invalid_image': forms.ImageField.default_error_messages['invalid_image'],
+}
+
+
+def _too_many_pixels():
+    return ValidationError(
+        ERROR_MESSAGES['too_many_pixels'], code='too_many_pixels',
+        params={'limit': settings.UPLOAD_MAX_PIXELS // 10 ** 6})
+
+
+def _header_size(data):
+    """Dimensions read from the header; pixel data is not decoded."""
+    if hasattr(data, 'temporary_file_path'):
+        file = data.temporary_file_path()
+    else:
+        file = data
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            with Image.open(file) as image:
+                return image.size
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise _too_many_pixels()
+    except Exception as exc:
+        raise ValidationError(ERROR_MESSAGES['invalid_image'],
+                              code='invalid_image') from exc
+    finally:
+        if hasattr(data, 'seek'):
+            data.seek(0)
+
+
+def check_image(data):
+    """Reject an uploaded image over ``UPLOAD_MAX_BYTES`` or, judging by
+    its header, ``UPLOAD_MAX_PIXELS``; for ``clean_<field>`` methods."""
+    if data.size > settings.UPLOAD_MAX_BYTES:
+        raise ValidationError(
+            ERROR_MESSAGES['too_large'], code='too_large',
+            params={'limit': filesizeformat(settings.UPLOAD_MAX_BYTES)})
+    width, height = _header_size(data)
+    if width * height > settings.UPLOAD_MAX_PIXELS:
+        raise _too_many_pixels()
@@ -0,0 +1,160 @@
+"""JSON API: read-only feeds for polling clients, and bulk follows.
+
+Each feed is paged by cursor like the HTML pages (``?cursor=``) and
+serialized compactly. The page is fetched first, then the ETag and
+``Last-Modified`` headers are computed from its rows and from the cache
+namespaces (see core.cache) of the feed and of the authors and groups
+on the page. The ETag hashes the ids, the ``updated`` stamps, the
+comment counts, thumbnail readiness, the cursors and the generations of
+those namespaces, so renamed authors and groups change it too.
+``Last-Modified`` is the time of the latest bump of any of them, which
+also moves when a post leaves the page. A client that sends
+the ETag back in ``If-None-Match`` gets a bodiless 304 until something
+on its page changes, and the page is never serialized. ``Cache-Control:
+no-cache`` makes clients revalidate on every poll.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_POST
+
+from core.cache import get_validators
+from core.paginator import CursorPaginator
+from . import follows, thumbnails, timeline
+from .cache import (FEED, author_namespace, follows_namespace,
+                    group_namespace)
+from .models import Group, Post, User
+
+
+def serialize(post):
+    card = getattr(post, 'card_thumbnail', None)
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'comments': post.comment_count,
+        # Until the worker has cleaned it, the original may carry EXIF.
+        'image': post.image.url if post.thumbnails_ready and post.image
+        else None,
+        'thumbnail': card.url if card else None,
+    }
+
+
+def validators(page, namespaces):
+    """Strong ETag and Last-Modified of a fetched page of a feed shown
+    under ``namespaces``."""
+    shown = {author_namespace(post.author_id) for post in page} | {
+        group_namespace(post.group_id) for post in page if post.group_id}
+    namespaces = [*namespaces, *sorted(shown - set(namespaces))]
+    generations, last_modified = get_validators(*namespaces)
+    digest = hashlib.sha1(repr((
+        [(post.pk, post.updated.timestamp(), post.comment_count,
+          post.thumbnails_ready) for post in page],
+        page.next_cursor, page.previous_cursor,
+        list(zip(namespaces, generations)),
+    )).encode())
+    return quote_etag(digest.hexdigest()), last_modified
+
+
+def feed_response(request, post_list, namespaces, private=False,
+                  ordering=('-pub_date', '-pk')):
+    paginator = CursorPaginator(post_list, settings.COUNT_POSTS, ordering)
+    page = paginator.get_page(request.GET.get('cursor'))
+    etag, last_modified = validators(page, namespaces)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        thumbnails.attach(page, 'card')
+        response = JsonResponse(
+            {
+                'results': [serialize(post) for post in page],
+                'next_cursor': page.next_cursor,
+                'previous_cursor': page.previous_cursor,
+            },
+            json_dumps_params={'separators': (',', ':'),
+                               'ensure_ascii': False})
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True, private=private)
+    return response
+
+
+def index(request):
+    return feed_response(request, Post.objects.for_feed(), [FEED])
+
+
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, group.posts.for_feed(),
+                         [group_namespace(group.pk)])
+
+
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, author.posts.for_feed(),
+                         [author_namespace(author.pk)])
+
+
+def unauthorized():
+    return JsonResponse({'detail': 'Authentication required'}, status=401)
+
+
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return unauthorized()
+    # New posts of followed authors bump FEED.
+    response = feed_response(
+        request, timeline.posts(request.user),
+        [FEED, follows_namespace(request.user.pk)], private=True,
+        ordering=timeline.ORDERING)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+@require_POST
+def follows_bulk(request):
+    """Follow and unfollow many authors at once.
+
+    The body is ``{"follow": [username, ...], "unfollow": [...]}``; the
+    answer lists the usernames actually followed and unfollowed and the
+    unknown ones. Repeating a request changes nothing.
+    """
+    if not request.user.is_authenticated:
+        return unauthorized()
+    try:
+        data = json.loads(request.body)
+        names = {action: data.get(action, []) for action in (
+            'follow', 'unfollow')}
+    except (ValueError, AttributeError):
+        return JsonResponse({'detail': 'Expected a JSON object'}, status=400)
+    if not all(isinstance(usernames, list)
+               and all(isinstance(name, str) for name in usernames)
+               for usernames in names.values()):
+        return JsonResponse({'detail': 'Expected lists of usernames'},
+                            status=400)
+    if sum(map(len, names.values())) > settings.FOLLOWS_BULK_LIMIT:
+        return JsonResponse(
+            {'detail': 'At most %d usernames per request'
+             % settings.FOLLOWS_BULK_LIMIT}, status=400)
+    ids = dict(User.objects.filter(
+        username__in={*names['follow'], *names['unfollow']}
+    ).values_list('username', 'pk'))
+    usernames = {pk: username for username, pk in ids.items()}
+    followed = follows.follow_many(
+        request.user, [ids[name] for name in names['follow'] if name in ids])
+    unfollowed = follows.unfollow_many(
+        request.user,
+        [ids[name] for name in names['unfollow'] if name in ids])
+    return JsonResponse({
+        'followed': [usernames[pk] for pk in followed],
+        'unfollowed': [usernames[pk] for pk in unfollowed],
+        'unknown': sorted({*names['follow'], *names['unfollow']} - set(ids)),
+    })
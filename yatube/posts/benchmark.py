@@ -0,0 +1,165 @@
+"""Latency, query and memory benchmark of the posts pages.
+
+``generate`` fills the database with synthetic users, groups, posts
+and follows (see posts.seed), then adds the reading user, who follows
+ten times more authors than the others, and comments under the
+benchmarked post.
+
+``measure`` requests every page of ``pages()`` through the test client,
+as the reading user, and records for each page:
+
+* p50, p99 and mean latency in milliseconds;
+* SQL queries per request;
+* peak Python memory per request in KiB, traced in a separate pass so
+  tracing does not slow down the timed requests.
+
+The cache is cleared before every request unless ``warm`` is set, so
+the numbers cover the ORM and the templates, not the page caches.
+``compare`` checks a report against a saved baseline. manage.py
+benchmark runs all of it on a throwaway database, with the caches of
+``local_caches()`` so clearing them leaves the configured ones alone.
+"""
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import counters
+from .follows import follow_many
+from .models import Comment, Group, Post, User
+from .seed import populate
+
+READER = 'benchmark-reader'
+# Relative growth of a metric over the baseline that counts as a
+# regression, by metric.
+TOLERANCE = {'p50_ms': 0.25, 'p99_ms': 0.5, 'queries': 0, 'memory_kib': 0.25}
+
+
+def local_caches():
+    """``CACHES`` with every cache that stores values replaced by a
+    local-memory one; wrappers around other aliases are kept."""
+    local = {}
+    for alias, params in settings.CACHES.items():
+        options = params.get('OPTIONS', {})
+        if 'TARGET' in options or 'SHARED' in options:
+            local[alias] = params
+        else:
+            local[alias] = {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': f'benchmark-{alias}',
+            }
+    return local
+
+
+def generate(users, posts, groups, follows, comments, seed=0,
+             progress=None):
+    """Seed the database with posts.seed; ``follows`` is the number of
+    authors every user follows, the reading user follows
+    ``10 * follows`` and ``comments`` are under the benchmarked post."""
+    populate(users=users, posts=posts, groups=groups, follows=follows,
+             seed=seed, progress=progress)
+    authors = list(User.objects.values_list('pk', flat=True))
+    reader = User.objects.create_user(READER)
+    follow_many(reader, random.Random(seed).sample(
+        authors, min(len(authors), follows * 10)))
+    post = Post.objects.order_by('-pub_date', '-pk').first()
+    Comment.objects.bulk_create(
+        Comment(post=post, author_id=author_id, text=f'comment {number}')
+        for number, author_id in enumerate(random.Random(seed).choices(
+            authors, k=comments)))
+    counters.incr_comment_count(post.pk, comments)
+
+
+def pages():
+    """``{name: url}`` of the benchmarked pages."""
+    post = Post.objects.order_by('-pub_date', '-pk').first()
+    group = Group.objects.order_by('pk').first()
+    author = post.author
+    return {
+        'index': reverse('posts:index'),
+        'group_list': reverse('posts:group_list',
+                              kwargs={'slug': group.slug}),
+        'profile': reverse('posts:profile',
+                           kwargs={'username': author.username}),
+        'post_detail': reverse('posts:post_detail',
+                               kwargs={'post_id': post.pk}),
+        'follow_index': reverse('posts:follow_index'),
+    }
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def _request(client, url, warm):
+    if not warm:
+        cache.clear()
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = client.get(url)
+        elapsed = time.perf_counter() - started
+    assert response.status_code == 200, (url, response.status_code)
+    return elapsed * 1000, len(queries)
+
+
+def _peak_memory(client, url, warm):
+    if not warm:
+        cache.clear()
+    tracemalloc.start()
+    try:
+        client.get(url)
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def measure(requests=50, warm=False):
+    client = Client()
+    client.force_login(User.objects.get(username=READER))
+    results = {}
+    for name, url in pages().items():
+        _request(client, url, warm=True)
+        samples = [_request(client, url, warm) for _ in range(requests)]
+        latencies = [latency for latency, _ in samples]
+        results[name] = {
+            'p50_ms': round(_percentile(latencies, 50), 2),
+            'p99_ms': round(_percentile(latencies, 99), 2),
+            'mean_ms': round(statistics.fmean(latencies), 2),
+            'queries': max(queries for _, queries in samples),
+            'memory_kib': round(_peak_memory(client, url, warm), 1),
+        }
+    return results
+
+
+def environment(sizes):
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'sizes': sizes,
+    }
+
+
+def compare(report, baseline, tolerance=None):
+    """Metrics that grew past ``tolerance`` over ``baseline``, as
+    ``(page, metric, baseline value, value)``."""
+    tolerance = {**TOLERANCE, **(tolerance or {})}
+    regressions = []
+    for page, metrics in report['pages'].items():
+        before = baseline['pages'].get(page, {})
+        for metric, allowed in tolerance.items():
+            if metric in before and (
+                    metrics[metric] > before[metric] * (1 + allowed)):
+                regressions.append(
+                    (page, metric, before[metric], metrics[metric]))
+    return regressions
@@ -0,0 +1,65 @@
+"""Cache keys of the posts templates.
+
+Feed fragments are keyed on generations (see core.cache) of these
+namespaces, and posts.signals bumps them whenever what they show changes.
+"""
+from itertools import islice
+
+from core.cache import bump_generation, delete_fragment, delete_fragments
+
+FEED = 'feed'
+POST_CARD_FRAGMENT = 'post_card'
+# Card keys deleted per cache round trip by drop_post_cards.
+DROP_BATCH_SIZE = 1000
+
+
+def group_namespace(group_id):
+    return f'group:{group_id}'
+
+
+def author_namespace(author_id):
+    return f'author:{author_id}'
+
+
+def follows_namespace(user_id):
+    """Follows of and to ``user_id``: the counts on their profile and
+    their followed set in posts.follow_graph."""
+    return f'follows:{user_id}'
+
+
+def post_namespaces(post, previous_group_id=None):
+    namespaces = {FEED, author_namespace(post.author_id)}
+    for group_id in (post.group_id, previous_group_id):
+        if group_id is not None:
+            namespaces.add(group_namespace(group_id))
+    return namespaces
+
+
+def post_card_vary_on(post_id, updated):
+    """Key parts of the {% cache %} block in single_post.html."""
+    return [post_id, updated.timestamp()]
+
+
+def drop_post_cards(posts):
+    """Forget the cards of ``posts``, a queryset. For changes to what
+    cards show of other rows: the author's username, the group's slug.
+    """
+    rows = posts.order_by().values_list('pk', 'updated').iterator()
+    while batch := list(islice(rows, DROP_BATCH_SIZE)):
+        delete_fragments(POST_CARD_FRAGMENT, (
+            post_card_vary_on(pk, updated) for pk, updated in batch))
+
+
+def thumbnail_key(post_id, name):
+    return f'thumbnail:{post_id}:{name}'
+
+
+def drop_post_caches(post):
+    """Forget the card and the feed pages of ``post``.
+
+    For changes made with ``update()``, which sends no signals; ``post``
+    must carry ``updated`` as it was before the change.
+    """
+    delete_fragment(POST_CARD_FRAGMENT,
+                    post_card_vary_on(post.pk, post.updated))
+    bump_generation(*post_namespaces(post))
@@ -0,0 +1,128 @@
+"""Maintained row counts, so feeds never run ``SELECT COUNT(*)``.
+
+A counter is a ``Counter`` row addressed by a key: ``'<scope>'`` for a
+whole table or ``'<scope>:<id>'`` for the rows pointing to one object.
+Signals in ``posts.signals`` move the values with ``F()`` updates,
+a missing row is computed once on first read, and
+``manage.py rebuild_counters`` reconciles everything in bulk (run it
+periodically, and after imports that bypass signals, e.g. bulk_create).
+
+Comments per post are kept on the post row itself (``Post.comment_count``)
+because every card that shows the number has already loaded the post.
+"""
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Comment, Counter, Post
+
+# scope: (model, field the rows are grouped by or None for the total)
+SCOPES = {
+    'posts': ('posts.Post', None),
+    'group_posts': ('posts.Post', 'group'),
+    'author_posts': ('posts.Post', 'author'),
+    'followers': ('posts.Follow', 'author'),
+    'following': ('posts.Follow', 'user'),
+}
+# Rebuilt by rebuild() along with the scopes.
+COMMENT_COUNT = 'comment_count'
+
+
+def key(scope, pk=None):
+    return scope if pk is None else f'{scope}:{pk}'
+
+
+def post_keys(post):
+    keys = [key('posts'), key('author_posts', post.author_id)]
+    if post.group_id is not None:
+        keys.append(key('group_posts', post.group_id))
+    return keys
+
+
+def profile_keys(user_id):
+    """Counters shown on a profile: posts, followers, following."""
+    return [key('author_posts', user_id), key('followers', user_id),
+            key('following', user_id)]
+
+
+def _queryset(scope):
+    model, field = SCOPES[scope]
+    return apps.get_model(model)._default_manager.all(), field
+
+
+def _compute(counter_key):
+    scope, _, pk = counter_key.partition(':')
+    queryset, field = _queryset(scope)
+    if field is not None:
+        queryset = queryset.filter(**{f'{field}_id': pk})
+    return queryset.count()
+
+
+def incr(keys, delta=1):
+    """Shift existing counters, missing ones are computed on next read."""
+    Counter.objects.filter(key__in=keys).update(value=F('value') + delta)
+
+
+def get(keys):
+    """Return ``{key: value}``, creating the rows that do not exist yet."""
+    values = dict(
+        Counter.objects.filter(key__in=keys).values_list('key', 'value'))
+    for missing in set(keys) - set(values):
+        values[missing] = _compute(missing)
+        try:
+            with transaction.atomic():
+                Counter.objects.create(key=missing, value=values[missing])
+        except IntegrityError:
+            pass
+    return values
+
+
+def total(keys):
+    """Sum of several counters, e.g. all authors of a subscription feed."""
+    return sum(get(list(keys)).values())
+
+
+def incr_comment_count(post_id, delta=1):
+    """Shift ``Post.comment_count``; ``updated`` moves so cards re-render.
+    Never below 0: rows inserted without signals (bulk_create) make the
+    count drift, and the column is unsigned."""
+    Post.objects.filter(pk=post_id).update(
+        comment_count=Greatest(F('comment_count') + delta, 0),
+        updated=timezone.now())
+
+
+def _rebuild_comment_counts():
+    comments = Comment.objects.filter(post=OuterRef('pk')).order_by()
+    comments = comments.values('post').annotate(
+        count=Count('pk')).values('count')
+    actual = Coalesce(Subquery(comments), Value(0))
+    Post.objects.exclude(comment_count=actual).update(
+        comment_count=actual, updated=timezone.now())
+
+
+def rebuild(scopes=None):
+    """Recompute counters from the tables, one GROUP BY per scope."""
+    for scope in scopes or [*SCOPES, COMMENT_COUNT]:
+        if scope == COMMENT_COUNT:
+            _rebuild_comment_counts()
+            continue
+        queryset, field = _queryset(scope)
+        with transaction.atomic():
+            if field is None:
+                rows = [Counter(key=scope, value=queryset.count())]
+            else:
+                grouped = queryset.exclude(
+                    **{f'{field}__isnull': True}).order_by()
+                values = dict(
+                    grouped.values_list(field).annotate(Count('pk')))
+                # Zero rows too, so no profile or group computes on read.
+                related = queryset.model._meta.get_field(field).related_model
+                rows = (
+                    Counter(key=key(scope, pk), value=values.get(pk, 0))
+                    for pk in related._default_manager.values_list(
+                        'pk', flat=True).iterator())
+            Counter.objects.bulk_create(
+                rows, batch_size=500, update_conflicts=True,
+                unique_fields=['key'], update_fields=['value'])
@@ -0,0 +1,160 @@
+"""Responsive variants of post images.
+
+The thumbnail worker (posts.thumbnails) first passes every upload
+through ``clean_original``, which replaces an original that is longer
+than ``POST_IMAGE_MAX_SIDE`` or carries metadata (EXIF with camera and
+GPS, XMP, comments) with a re-encoded copy, so the served original is
+stripped too. It then calls ``render``: the original is rotated by its
+EXIF orientation, scaled to each of ``POST_IMAGE_WIDTHS`` not wider than
+itself and encoded in each of ``POST_IMAGE_FORMATS`` that this Pillow
+can write, with the quality from ``POST_IMAGE_QUALITY``. Metadata is
+not copied. Files go to ``derivatives/<post id>/`` and are listed as
+``ImageDerivative`` rows. Variants are optional: posts without them
+show the thumbnails alone, and manage.py render_derivatives renders the
+missing ones again.
+
+``attach`` gives a page of posts their ``<source>`` entries (MIME type
+and ``srcset``) with one cache ``get_many`` and one query for misses.
+"""
+import io
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .models import ImageDerivative
+
+# format: (Pillow format name, MIME type, file extension)
+FORMATS = {
+    'avif': ('AVIF', 'image/avif', 'avif'),
+    'webp': ('WEBP', 'image/webp', 'webp'),
+    'jpeg': ('JPEG', 'image/jpeg', 'jpg'),
+}
+# Image.info keys of metadata that clean_original strips.
+METADATA = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment')
+
+
+def sources_key(post_id):
+    return f'image_sources:{post_id}'
+
+
+def supported_formats():
+    """Configured formats this Pillow can encode, best first."""
+    Image.init()
+    return [name for name in settings.POST_IMAGE_FORMATS
+            if FORMATS[name][0] in Image.SAVE]
+
+
+def _encode(image, name):
+    pillow_format, _, _ = FORMATS[name]
+    if image.mode not in ('RGB', 'RGBA') or (
+            name == 'jpeg' and image.mode == 'RGBA'):
+        image = image.convert('RGB')
+    # Encoders copy EXIF and XMP from info, keep only the color profile.
+    image.info = {key: value for key, value in image.info.items()
+                  if key == 'icc_profile'}
+    buffer = io.BytesIO()
+    image.save(buffer, pillow_format,
+               quality=settings.POST_IMAGE_QUALITY[name], optimize=True)
+    return buffer.getvalue()
+
+
+def _has_metadata(image):
+    return bool(image.getexif()) or any(
+        key in image.info for key in METADATA)
+
+
+def clean_original(post):
+    """Save a copy of the original scaled down to ``POST_IMAGE_MAX_SIDE``
+    and without metadata; return its name, or None if the original is
+    within the limit and has no metadata."""
+    limit = settings.POST_IMAGE_MAX_SIDE
+    with post.image.open('rb') as original:
+        image = Image.open(original)
+        if max(image.size) <= limit and not _has_metadata(image):
+            return None
+        image_format = image.format
+        image.draft('RGB', (limit, limit))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((limit, limit), Image.LANCZOS)
+    name = {'JPEG': 'jpeg', 'WEBP': 'webp'}.get(image_format)
+    if name is not None:
+        content, extension = _encode(image, name), FORMATS[name][2]
+    else:
+        # Anything else is kept lossless, with its transparency.
+        image.info = {}
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG', optimize=True)
+        content, extension = buffer.getvalue(), 'png'
+    stem = os.path.splitext(post.image.name)[0]
+    return default_storage.save(f'{stem}-{max(image.size)}.{extension}',
+                                ContentFile(content))
+
+
+def render(post):
+    """Write the variants of ``post.image``, replacing earlier ones."""
+    forget(post.pk)
+    with post.image.open('rb') as original:
+        image = ImageOps.exif_transpose(Image.open(original))
+        image.load()
+    stem = os.path.splitext(os.path.basename(post.image.name))[0]
+    widths = sorted({min(width, image.width)
+                     for width in settings.POST_IMAGE_WIDTHS})
+    rows = []
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        scaled = image.resize((width, height), Image.LANCZOS)
+        for name in supported_formats():
+            extension = FORMATS[name][2]
+            path = default_storage.save(
+                f'derivatives/{post.pk}/{stem}-{width}.{extension}',
+                ContentFile(_encode(scaled, name)))
+            rows.append(ImageDerivative(post_id=post.pk, format=name,
+                                        width=width, height=height,
+                                        file=path))
+    ImageDerivative.objects.bulk_create(rows)
+    cache.delete(sources_key(post.pk))
+
+
+def forget(post_id):
+    """Delete the variants of a replaced or removed image."""
+    derivatives = ImageDerivative.objects.filter(post_id=post_id)
+    for path in derivatives.values_list('file', flat=True):
+        default_storage.delete(path)
+    derivatives.delete()
+    cache.delete(sources_key(post_id))
+
+
+def _sources(derivatives):
+    by_format = defaultdict(list)
+    for name, width, path in derivatives:
+        by_format[name].append(f'{default_storage.url(path)} {width}w')
+    return [{'type': FORMATS[name][1], 'srcset': ', '.join(by_format[name])}
+            for name in settings.POST_IMAGE_FORMATS if name in by_format]
+
+
+def attach(posts):
+    """Set ``post.image_sources`` (a list of {type, srcset}, may be empty)
+    on posts with ready images."""
+    keys = {sources_key(post.pk): post for post in posts
+            if post.image and post.thumbnails_ready}
+    if not keys:
+        return
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        stored = ImageDerivative.objects.filter(
+            post__in=[keys[key].pk for key in missing]).order_by('width')
+        rows = defaultdict(list)
+        for post_id, *derivative in stored.values_list(
+                'post', 'format', 'width', 'file'):
+            rows[post_id].append(derivative)
+        fetched = {key: _sources(rows[keys[key].pk]) for key in missing}
+        cache.set_many(fetched, settings.POST_THUMBNAIL_CACHE_TIMEOUT)
+        found.update(fetched)
+    for key, post in keys.items():
+        post.image_sources = found[key]
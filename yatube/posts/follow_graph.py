@@ -0,0 +1,72 @@
+"""Who follows whom, per user, from the cache.
+
+The ids of the authors a user follows are kept as one sorted
+``array('Q')`` (8 bytes per author) under a key built from the
+generation of the user's ``follows_namespace``. posts.follows bumps it
+on every follow and unfollow, so a changed set is simply never read
+again. The set is loaded on first use with one query, and later at
+most once per request, where it is memoized on the user.
+
+``followed_on`` picks the followed authors of a page of posts by
+bisecting the array: no query per card. Pages render them after their
+cached fragment, which is shared by every visitor and so must not
+depend on who is looking.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.cache import get_generation
+from .cache import follows_namespace
+from .models import Follow
+
+
+def _key(user_id, generation):
+    return f'follow_graph:{user_id}:{generation}'
+
+
+def followed_authors(user):
+    """``(generation, sorted array of followed author ids)``."""
+    memo = getattr(user, '_followed_authors', None)
+    if memo is not None:
+        return memo
+    generation = get_generation(follows_namespace(user.pk))
+    key = _key(user.pk, generation)
+    authors = array('Q')
+    data = cache.get(key)
+    if data is None:
+        authors.extend(Follow.objects.filter(user=user).order_by(
+            'author_id').values_list('author_id', flat=True))
+        cache.set(key, authors.tobytes(), settings.FOLLOW_GRAPH_TIMEOUT)
+    else:
+        authors.frombytes(data)
+    user._followed_authors = generation, authors
+    return user._followed_authors
+
+
+def _contains(authors, author_id):
+    position = bisect_left(authors, author_id)
+    return position < len(authors) and authors[position] == author_id
+
+
+def is_following(user, author_id):
+    if not user.is_authenticated:
+        return False
+    return _contains(followed_authors(user)[1], author_id)
+
+
+def followed_on(posts, user):
+    """Authors of a page of posts that ``user`` follows, in page order.
+    The page is not fetched when the user follows nobody."""
+    if not user.is_authenticated:
+        return []
+    authors = followed_authors(user)[1]
+    if not authors:
+        return []
+    found = {}
+    for post in posts:
+        if _contains(authors, post.author_id):
+            found.setdefault(post.author_id, post.author)
+    return list(found.values())
@@ -0,0 +1,161 @@
+"""Follow and unfollow, one author or many at a time.
+
+Writes lean on the ``unique_follow`` constraint instead of checking
+first. A single follow is one ``INSERT``, and an ``IntegrityError``
+means the user already follows the author. Many follows are one
+``INSERT ... ON CONFLICT DO NOTHING RETURNING`` per batch, and
+unfollowing is one ``DELETE ... RETURNING``: the side effects are
+applied to the rows the statement itself inserted or deleted, so
+concurrent calls for the same follows count each of them once. On
+databases without ``RETURNING`` rows are written one at a time and
+the row count of each statement tells the same. Every call is
+idempotent and safe to repeat or race.
+
+The side effects of a follow are the counters, the subscription feed
+and the profile validators. ``followed`` and ``unfollowed`` apply them
+once per call, with one counter update per direction. posts.signals
+applies the same functions to follows saved or deleted one by one
+through the ORM.
+"""
+from django.db import IntegrityError, connection, transaction
+
+from core.cache import bump_generation
+from . import counters, timeline
+from .cache import follows_namespace
+from .models import Follow
+
+BATCH_SIZE = 1000
+
+
+def followed(user_id, author_ids):
+    if not author_ids:
+        return
+    counters.incr([counters.key('followers', author_id)
+                   for author_id in author_ids])
+    counters.incr([counters.key('following', user_id)], len(author_ids))
+    for author_id in author_ids:
+        timeline.backfill(user_id, author_id)
+    bump_generation(follows_namespace(user_id),
+                    *(follows_namespace(author_id)
+                      for author_id in author_ids))
+
+
+def unfollowed(user_id, author_ids):
+    if not author_ids:
+        return
+    counters.incr([counters.key('followers', author_id)
+                   for author_id in author_ids], -1)
+    counters.incr([counters.key('following', user_id)], -len(author_ids))
+    timeline.remove(user_id, author_ids)
+    timeline.fan_out_history(author_ids)
+    bump_generation(follows_namespace(user_id),
+                    *(follows_namespace(author_id)
+                      for author_id in author_ids))
+
+
+def follow(user, author):
+    """Follow one author; False if already followed or ``author`` is
+    ``user``."""
+    if user.pk == author.pk:
+        return False
+    try:
+        with transaction.atomic():
+            Follow.objects.create(user=user, author=author)
+    except IntegrityError:
+        return False
+    return True
+
+
+def _returning():
+    """True if the database returns the rows touched by ``INSERT ... ON
+    CONFLICT DO NOTHING`` and ``DELETE``."""
+    return (connection.vendor in ('sqlite', 'postgresql')
+            and connection.features.can_return_rows_from_bulk_insert)
+
+
+def _batches(author_ids):
+    author_ids = sorted(author_ids)
+    for start in range(0, len(author_ids), BATCH_SIZE):
+        yield author_ids[start:start + BATCH_SIZE]
+
+
+def _sql(template, **parts):
+    """``template`` with the quoted follow table and columns and
+    ``parts`` filled in."""
+    quote = connection.ops.quote_name
+    meta = Follow._meta
+    return template.format(
+        table=quote(meta.db_table),
+        user=quote(meta.get_field('user').column),
+        author=quote(meta.get_field('author').column), **parts)
+
+
+def _insert(user_id, author_ids):
+    """Insert the missing follows; return the authors inserted here."""
+    if not _returning():
+        inserted = []
+        for author_id in sorted(author_ids):
+            try:
+                with transaction.atomic():
+                    Follow.objects.bulk_create(
+                        [Follow(user_id=user_id, author_id=author_id)])
+            except IntegrityError:
+                continue
+            inserted.append(author_id)
+        return inserted
+    inserted = []
+    with connection.cursor() as cursor:
+        for batch in _batches(author_ids):
+            cursor.execute(_sql(
+                'INSERT INTO {table} ({user}, {author}) VALUES {rows} '
+                'ON CONFLICT DO NOTHING RETURNING {author}',
+                rows=', '.join(['(%s, %s)'] * len(batch))),
+                [value for author_id in batch
+                 for value in (user_id, author_id)])
+            inserted += [author_id for author_id, in cursor.fetchall()]
+    return sorted(inserted)
+
+
+def _delete(user_id, author_ids):
+    """Delete the follows; return the authors deleted here."""
+    deleted = []
+    with connection.cursor() as cursor:
+        if not _returning():
+            for author_id in sorted(author_ids):
+                cursor.execute(_sql(
+                    'DELETE FROM {table} WHERE {user} = %s '
+                    'AND {author} = %s'), [user_id, author_id])
+                if cursor.rowcount:
+                    deleted.append(author_id)
+            return deleted
+        for batch in _batches(author_ids):
+            cursor.execute(_sql(
+                'DELETE FROM {table} WHERE {user} = %s '
+                'AND {author} IN ({ids}) RETURNING {author}',
+                ids=', '.join(['%s'] * len(batch))), [user_id, *batch])
+            deleted += [author_id for author_id, in cursor.fetchall()]
+    return sorted(deleted)
+
+
+def follow_many(user, author_ids):
+    """Follow every author of ``author_ids``; return those newly
+    followed."""
+    with transaction.atomic():
+        new = _insert(user.pk, set(author_ids) - {user.pk})
+        followed(user.pk, new)
+    return new
+
+
+def unfollow_many(user, author_ids):
+    """Stop following ``author_ids``; return those that were followed.
+    The rows are deleted without signals: the side effects are applied
+    once, below."""
+    with transaction.atomic():
+        gone = _delete(user.pk, set(author_ids))
+        unfollowed(user.pk, gone)
+    return gone
+
+
+def unfollow(user, author):
+    """Stop following one author; False if not followed."""
+    return bool(unfollow_many(user, [author.pk]))
@@ -1,6 +1,8 @@
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 from django.utils.translation import gettext_lazy as _
 
+from core.uploads import check_image
 from .models import Post, Comment
 
 
@@ -19,6 +21,13 @@ class PostForm(ModelForm):
             'image': _('Attach image of post'),
         }
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        # A new upload; an unchanged image is the stored FieldFile.
+        if isinstance(image, UploadedFile):
+            check_image(image)
+        return image
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from posts import benchmark, seed
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = ('Seed a throwaway database and measure latency, queries and '
+            'memory of the feed pages. Compare with --baseline to catch '
+            'regressions before a release.')
+
+    def add_arguments(self, parser):
+        sizes = parser.add_argument_group('data set')
+        sizes.add_argument('--users', type=int, default=1000)
+        sizes.add_argument('--posts', type=int, default=10000)
+        sizes.add_argument('--groups', type=int, default=20)
+        sizes.add_argument('--follows', type=int, default=20,
+                           help='Authors followed by every user.')
+        sizes.add_argument('--comments', type=int, default=200,
+                           help='Comments under the benchmarked post.')
+        sizes.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Timed requests per page.')
+        parser.add_argument('--warm', action='store_true',
+                            help='Keep the caches between requests.')
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Keep the benchmark database and reuse it next time.')
+        parser.add_argument('--output', help='Write the report as JSON.')
+        parser.add_argument(
+            '--baseline',
+            help='Report to compare with; regressions exit with an error.')
+        parser.add_argument(
+            '--tolerance', type=float,
+            help='Allowed relative latency growth over the baseline '
+                 '(default: %(p50_ms)s for p50, %(p99_ms)s for p99).'
+                 % benchmark.TOLERANCE)
+
+    def handle(self, *args, **options):
+        sizes = {name: options[name] for name in (
+            'users', 'posts', 'groups', 'follows', 'comments', 'seed')}
+        if connection.vendor == 'sqlite':
+            # Outside the project, and stable for --keepdb.
+            connection.settings_dict['TEST']['NAME'] = os.path.join(
+                tempfile.gettempdir(), 'yatube-benchmark.sqlite3')
+        with override_settings(CACHES=benchmark.local_caches()):
+            report = self.run_benchmark(sizes, options)
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+        if options['baseline']:
+            self.check_baseline(report, options['baseline'],
+                                options['tolerance'])
+
+    def run_benchmark(self, sizes, options):
+        old_name = connection.settings_dict['NAME']
+        # DEBUG off, as in production: no debug toolbar, no query log.
+        setup_test_environment(debug=False)
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            if not User.objects.filter(username=benchmark.READER).exists():
+                with seed.bulk_load():
+                    benchmark.generate(**sizes, progress=self.progress)
+            return {
+                'environment': benchmark.environment(sizes),
+                'pages': benchmark.measure(options['requests'],
+                                           options['warm']),
+            }
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+    def progress(self, label, done, total):
+        if done and done == total:
+            self.stdout.write(f'{label}: {done}')
+
+    def print_report(self, report):
+        self.stdout.write(f'{"page":<14}{"p50 ms":>9}{"p99 ms":>9}'
+                          f'{"queries":>9}{"KiB":>9}')
+        for page, metrics in report['pages'].items():
+            self.stdout.write(
+                f'{page:<14}{metrics["p50_ms"]:>9}{metrics["p99_ms"]:>9}'
+                f'{metrics["queries"]:>9}{metrics["memory_kib"]:>9}')
+
+    def check_baseline(self, report, path, tolerance):
+        with open(path) as file:
+            baseline = json.load(file)
+        if baseline['environment']['sizes'] != report['environment']['sizes']:
+            self.stderr.write('The baseline was measured on other sizes')
+        regressions = benchmark.compare(
+            report, baseline, tolerance and {
+                'p50_ms': tolerance, 'p99_ms': tolerance})
+        for page, metric, before, after in regressions:
+            self.stderr.write(f'{page} {metric}: {before} -> {after}')
+        if regressions:
+            raise CommandError(f'{len(regressions)} regressions')
+        self.stdout.write(self.style.SUCCESS('No regressions'))
@@ -0,0 +1,66 @@
+import argparse
+import csv
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.cache import bump_generation
+from posts import counters, timeline
+from posts.cache import follows_namespace
+from posts.follows import BATCH_SIZE
+from posts.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = ('Import follows from a CSV file of "follower,author" username '
+            'pairs. Rows are inserted in batches and existing follows are '
+            'kept; the follow counters are rebuilt at the end.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'file', type=argparse.FileType('r', encoding='utf-8'),
+            help='CSV file, "-" for stdin.')
+        parser.add_argument(
+            '--no-timeline', action='store_true',
+            help='Do not backfill subscription feeds of imported follows.')
+
+    def handle(self, *args, **options):
+        self.backfill = not options['no_timeline']
+        batch, processed, skipped = [], 0, 0
+        with options['file'] as file:
+            for row in csv.reader(file):
+                if len(row) != 2 or row[0] == row[1]:
+                    skipped += 1
+                    continue
+                batch.append(row)
+                if len(batch) == BATCH_SIZE:
+                    processed += self.flush(batch)
+                    batch = []
+        processed += self.flush(batch)
+        counters.rebuild(['followers', 'following'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {processed} follows'
+            f' ({skipped} malformed rows skipped)'))
+
+    def flush(self, batch):
+        """Insert a batch of pairs; return how many had known users."""
+        ids = dict(User.objects.filter(
+            username__in={name for pair in batch for name in pair}
+        ).values_list('username', 'pk'))
+        pairs = [(ids[user], ids[author]) for user, author in batch
+                 if user in ids and author in ids]
+        with transaction.atomic():
+            Follow.objects.bulk_create(
+                (Follow(user_id=user_id, author_id=author_id)
+                 for user_id, author_id in pairs),
+                batch_size=BATCH_SIZE, ignore_conflicts=True)
+            if self.backfill:
+                # Idempotent: follows that existed already are harmless.
+                for user_id, author_id in pairs:
+                    timeline.backfill(user_id, author_id)
+        bump_generation(*{follows_namespace(user_id)
+                          for pair in pairs for user_id in pair})
+        if len(pairs) < len(batch):
+            self.stderr.write(
+                f'{len(batch) - len(pairs)} rows with unknown users')
+        return len(pairs)
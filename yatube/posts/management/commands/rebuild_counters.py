@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = ('Recompute denormalized counters from the tables. '
+            'Run it periodically (cron) to reconcile drift.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scopes', nargs='*',
+            help='Scopes to rebuild (%s), all by default.' % ', '.join(
+                sorted([*counters.SCOPES, counters.COMMENT_COUNT])))
+
+    def handle(self, *args, **options):
+        unknown = set(options['scopes']) - {
+            *counters.SCOPES, counters.COMMENT_COUNT}
+        if unknown:
+            raise CommandError('Unknown scopes: %s' % ', '.join(unknown))
+        counters.rebuild(options['scopes'])
+        self.stdout.write(self.style.SUCCESS('Counters rebuilt'))
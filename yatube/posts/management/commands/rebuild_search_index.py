@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the full-text search index from the posts table. '
+            'Run it after bulk imports that bypass model signals.')
+
+    def handle(self, *args, **options):
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            'Search index rebuilt (%s)' % settings.SEARCH_BACKEND))
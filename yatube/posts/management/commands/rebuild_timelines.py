@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import TimelineEntry
+
+
+class Command(BaseCommand):
+    help = ('Rebuild subscription feeds from follows and posts: copy '
+            'missing posts and drop entries of removed follows. Run it '
+            'once after migration 0013 to fill the feeds of existing '
+            'follows, and whenever feeds drift.')
+
+    def handle(self, *args, **options):
+        timeline.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Timelines rebuilt: {TimelineEntry.objects.count()} entries'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Render the responsive variants of post images that have '
+            'thumbnails but no variants, e.g. after a failed render.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Render the variants of every image.')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.filter(thumbnails_ready=True).exclude(
+            image='').only('author', 'group', 'image', 'updated')
+        if not options['all']:
+            posts = posts.filter(derivatives__isnull=True)
+        rendered = failed = 0
+        for post in posts.iterator():
+            if thumbnails.render_derivatives(post):
+                rendered += 1
+            else:
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered the variants of {rendered} posts'))
+        if failed:
+            self.stderr.write(f'{failed} posts failed, see the log')
@@ -0,0 +1,57 @@
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand
+
+from posts import seed
+
+
+class Command(BaseCommand):
+    help = ('Fill the database with synthetic users, groups, posts, '
+            'comments, follows and chat messages, inserted in batches. '
+            'The same --seed gives the same data on an empty database.')
+
+    def add_arguments(self, parser):
+        sizes = parser.add_argument_group('data set')
+        sizes.add_argument('--users', type=int, default=1000)
+        sizes.add_argument('--posts', type=int, default=10000)
+        sizes.add_argument('--groups', type=int, default=20)
+        sizes.add_argument('--follows', type=int, default=20,
+                           help='Authors followed by every user.')
+        sizes.add_argument('--comments', type=int, default=20000)
+        sizes.add_argument('--messages', type=int, default=10000,
+                           help='Chat messages.')
+        sizes.add_argument('--rooms', type=int, default=5,
+                           help='Chat rooms the messages are spread over.')
+        sizes.add_argument('--days', type=int, default=365,
+                           help='Posts are dated over DAYS days up to a date '
+                                'derived from --seed.')
+        sizes.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int,
+                            default=seed.BATCH_SIZE,
+                            help='Rows per INSERT and per transaction.')
+        parser.add_argument(
+            '--bulk-load', action='store_true',
+            help='Turn off SQLite fsync and keep its journal in memory '
+                 'while loading. A crash corrupts the database.')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        self.started = {}
+        began = time.monotonic()
+        with seed.bulk_load() if options['bulk_load'] else nullcontext():
+            seed.populate(**{name: options[name] for name in (
+                'users', 'posts', 'groups', 'follows', 'comments',
+                'messages', 'rooms', 'days', 'seed', 'batch_size')},
+                progress=self.progress)
+        if self.verbosity:
+            self.stdout.write(self.style.SUCCESS(
+                f'Seeded in {time.monotonic() - began:.1f} s'))
+
+    def progress(self, label, done, total):
+        started = self.started.setdefault(label, time.monotonic())
+        if done and (self.verbosity > 1
+                     or self.verbosity and done == total):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'{label}: {done}/{total} rows, '
+                              f'{done / max(elapsed, 1e-3):.0f} rows/s')
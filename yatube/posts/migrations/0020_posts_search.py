@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def create_search_table(apps, schema_editor):
+    from posts.search import fts5_available
+    if not fts5_available(schema_editor.connection):
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS posts_search USING fts5("
+        "text, group_title, tokenize='unicode61 remove_diacritics 2')")
+    schema_editor.execute(
+        'INSERT INTO posts_search (rowid, text, group_title) '
+        'SELECT post.id, post.text, COALESCE("group".title, \'\') '
+        'FROM posts_post post '
+        'LEFT JOIN posts_group "group" ON "group".id = post.group_id')
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_imagederivative'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -15,6 +15,22 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    # Columns templates/posts/includes/single_post.html reads.
+    FEED_FIELDS = (
+        'pub_date', 'updated', 'text', 'image', 'thumbnails_ready',
+        'comment_count',
+        'author__username',
+        'group__slug', 'group__title',
+    )
+
+    def for_feed(self):
+        """Posts ready for a feed page: one query with author and group
+        joined, and nothing else loaded."""
+        return self.select_related('author', 'group').only(
+            *self.FEED_FIELDS)
+
+
 class Post(PubDateModels):
     text = models.TextField(
         'Текст поста',
@@ -37,6 +53,15 @@ class Post(PubDateModels):
         help_text='Выберите группу'
     )
     image = models.ImageField('image', upload_to='posts/', blank=True)
+    # False while posts.thumbnails renders the thumbnails of a new image.
+    thumbnails_ready = models.BooleanField(
+        'thumbnails ready', default=True, editable=False)
+    updated = models.DateTimeField('updated', auto_now=True)
+    # Maintained by posts.counters, never edited directly.
+    comment_count = models.PositiveIntegerField(
+        'comments', default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
@@ -45,6 +70,15 @@ class Post(PubDateModels):
         return self.text[:15]
 
 
+class CommentQuerySet(models.QuerySet):
+    # Columns a rendered or serialized comment reads.
+    THREAD_FIELDS = ('post', 'pub_date', 'text', 'author__username')
+
+    def for_thread(self):
+        """Comments with their authors joined in the same query."""
+        return self.select_related('author').only(*self.THREAD_FIELDS)
+
+
 class Comment(PubDateModels):
     post = models.ForeignKey(
         Post,
@@ -61,6 +95,54 @@ class Comment(PubDateModels):
     text = models.TextField('Comment of post',
                             help_text='Enter a comment to the post')
 
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'pub_date'],
+                         name='comment_post_pub_date'),
+        ]
+
+    def as_dict(self):
+        """What the "load more" endpoint returns for a comment."""
+        return {
+            'author': self.author.username,
+            'text': self.text,
+            'pub_date': self.pub_date.isoformat(),
+        }
+
+
+class Thumbnail(models.Model):
+    """A rendered thumbnail of a post image, see posts.thumbnails."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='thumbnails'
+    )
+    name = models.CharField(max_length=16)
+    url = models.CharField(max_length=255)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'name'],
+                                    name='unique_post_thumbnail'),
+        ]
+
+
+class ImageDerivative(models.Model):
+    """A post image re-encoded at one width, see posts.derivatives."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='derivatives'
+    )
+    format = models.CharField(max_length=8)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    file = models.FileField(max_length=255)
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -80,3 +162,38 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='unique_follow')
         ]
+
+
+class Counter(models.Model):
+    """Denormalized row count, see posts.counters."""
+    key = models.CharField(max_length=64, unique=True)
+    value = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.key}={self.value}'
+
+
+class TimelineEntry(models.Model):
+    """Post delivered to a follower's subscription feed, see posts.timeline.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_feed'),
+        ]
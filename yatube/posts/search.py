@@ -0,0 +1,331 @@
+"""Full-text search over post texts and group titles.
+
+Two backends behind one interface, picked by ``SEARCH_BACKEND``:
+
+``fts5``
+    An SQLite FTS5 table ``posts_search`` (rowid = post id), created by
+    migration 0020 and ranked with bm25. The default on SQLite.
+``inverted``
+    A BM25-ranked inverted index kept in memory and persisted under
+    ``SEARCH_INDEX_DIR`` as a snapshot plus an append-only journal of
+    changes, which other processes replay before they search. For
+    databases without FTS5.
+
+posts.signals keeps the index current on post save and delete and on
+group renames; ``manage.py rebuild_search_index`` rebuilds it from the
+tables. ``search(query)`` returns a lazy sequence of posts that
+``Paginator`` slices, so only one page of posts is ever loaded.
+"""
+import json
+import math
+import os
+import pickle
+import re
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Post
+
+TOKEN = re.compile(r'\w+')
+FTS_TABLE = 'posts_search'
+# bm25 weights of the text and group_title columns.
+FTS_WEIGHTS = (1.0, 0.5)
+
+
+def tokenize(text):
+    return TOKEN.findall(text.casefold())
+
+
+def document(post):
+    """Indexed columns of ``post``: its text and its group's title."""
+    return post.text, post.group.title if post.group_id else ''
+
+
+class SearchResults:
+    """Ranked posts matching a query, fetched a slice at a time."""
+
+    def __init__(self, backend, query):
+        self.backend = backend
+        self.query = query
+
+    def count(self):
+        if not hasattr(self, '_count'):
+            self._count = self.backend.count(self.query)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        ids = self.backend.ids(self.query, start, stop - start)
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+class FTS5Backend:
+
+    @staticmethod
+    def match(query):
+        """FTS5 query: every token required, the last one as a prefix."""
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        terms = [f'"{token}"' for token in tokens]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def count(self, query):
+        match = self.match(query)
+        if match is None:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                [match])
+            return cursor.fetchone()[0]
+
+    def ids(self, query, offset, limit):
+        match = self.match(query)
+        if match is None:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, %s, %s), rowid DESC '
+                'LIMIT %s OFFSET %s',
+                [match, *FTS_WEIGHTS, limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+
+    def index(self, posts):
+        rows = [(post.pk, *document(post)) for post in posts]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(pk,) for pk, _, _ in rows])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, text, group_title) '
+                'VALUES (%s, %s, %s)', rows)
+
+    def remove(self, post_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(pk,) for pk in post_ids])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text, group_title) '
+                'SELECT post.id, post.text, COALESCE("group".title, \'\') '
+                'FROM posts_post post '
+                'LEFT JOIN posts_group "group" ON "group".id = post.group_id')
+
+
+class InvertedIndexBackend:
+    """BM25 over an in-memory inverted index persisted to disk."""
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, directory):
+        self.snapshot_path = os.path.join(directory, 'search.pickle')
+        self.journal_path = os.path.join(directory, 'search.journal')
+        self.lock = threading.RLock()
+        self._reset()
+        self.journal_offset = 0
+        # (device, inode) of the journal read so far: rebuild() replaces
+        # the file, and offsets into the old one mean nothing in the new.
+        self.journal_id = None
+        self.loaded = False
+
+    def _reset(self):
+        self.postings = defaultdict(dict)  # token: {post id: frequency}
+        self.terms = {}  # post id: {token: frequency}
+        self.total_length = 0
+
+    # Storage
+
+    def _load(self):
+        self._reset()
+        try:
+            with open(self.snapshot_path, 'rb') as file:
+                for pk, terms in pickle.load(file).items():
+                    self._add(pk, terms)
+        except FileNotFoundError:
+            pass
+        self.journal_offset = 0
+        self.loaded = True
+
+    def _refresh(self):
+        """Catch up with the journal, including other processes' writes."""
+        if not self.loaded:
+            self._load()
+        try:
+            with open(self.journal_path, 'rb') as journal:
+                stat = os.fstat(journal.fileno())
+                journal_id = (stat.st_dev, stat.st_ino)
+                if journal_id != self.journal_id or (
+                        stat.st_size < self.journal_offset):
+                    if self.journal_id is not None:
+                        # Rebuilt elsewhere: start over from the snapshot.
+                        self._load()
+                    self.journal_id = journal_id
+                journal.seek(self.journal_offset)
+                for line in journal:
+                    if not line.endswith(b'\n'):
+                        break
+                    self.journal_offset += len(line)
+                    self._apply(json.loads(line))
+        except FileNotFoundError:
+            pass
+
+    def _write(self, entries):
+        lines = ''.join(json.dumps(entry, ensure_ascii=False) + '\n'
+                        for entry in entries)
+
+        def append():
+            os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+            with open(self.journal_path, 'a', encoding='utf-8') as journal:
+                journal.write(lines)
+
+        # The file is outside the transaction: only log what was saved.
+        transaction.on_commit(append)
+
+    # Index
+
+    def _add(self, pk, terms):
+        self.terms[pk] = terms
+        self.total_length += sum(terms.values())
+        for token, frequency in terms.items():
+            self.postings[token][pk] = frequency
+
+    def _discard(self, pk):
+        terms = self.terms.pop(pk, None)
+        if terms is None:
+            return
+        self.total_length -= sum(terms.values())
+        for token in terms:
+            self.postings[token].pop(pk, None)
+            if not self.postings[token]:
+                del self.postings[token]
+
+    def _apply(self, entry):
+        self._discard(entry['id'])
+        if 'terms' in entry:
+            self._add(entry['id'], entry['terms'])
+
+    def _ranked(self, query):
+        tokens = set(tokenize(query))
+        if not tokens or any(token not in self.postings for token in tokens):
+            return []
+        documents = len(self.terms)
+        average = self.total_length / documents
+        candidates = set.intersection(
+            *(set(self.postings[token]) for token in tokens))
+        scores = []
+        for pk in candidates:
+            length = sum(self.terms[pk].values())
+            score = 0.0
+            for token in tokens:
+                matching = len(self.postings[token])
+                idf = math.log(
+                    1 + (documents - matching + 0.5) / (matching + 0.5))
+                frequency = self.postings[token][pk]
+                score += idf * frequency * (self.K1 + 1) / (
+                    frequency + self.K1 * (
+                        1 - self.B + self.B * length / average))
+            scores.append((-score, -pk))
+        return [-pk for _, pk in sorted(scores)]
+
+    @staticmethod
+    def terms_of(post):
+        text, group_title = document(post)
+        return dict(Counter(tokenize(text)) + Counter(tokenize(group_title)))
+
+    # Backend interface
+
+    def count(self, query):
+        with self.lock:
+            self._refresh()
+            return len(self._ranked(query))
+
+    def ids(self, query, offset, limit):
+        with self.lock:
+            self._refresh()
+            return self._ranked(query)[offset:offset + limit]
+
+    def index(self, posts):
+        entries = [{'id': post.pk, 'terms': self.terms_of(post)}
+                   for post in posts]
+        self._write(entries)
+
+    def remove(self, post_ids):
+        self._write({'id': pk} for pk in post_ids)
+
+    def rebuild(self):
+        """Write a fresh snapshot from the tables and empty the journal."""
+        snapshot = {}
+        posts = Post.objects.select_related('group').only(
+            'text', 'group__title')
+        for post in posts.iterator():
+            snapshot[post.pk] = self.terms_of(post)
+        with self.lock:
+            os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+            temporary = self.snapshot_path + '.tmp'
+            with open(temporary, 'wb') as file:
+                pickle.dump(snapshot, file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, self.snapshot_path)
+            # A new file, not a truncated one: see journal_id.
+            temporary = self.journal_path + '.tmp'
+            open(temporary, 'w').close()
+            os.replace(temporary, self.journal_path)
+            self.loaded = False
+
+
+_backends = {}
+
+
+def fts5_available(db_connection=connection):
+    if db_connection.vendor != 'sqlite':
+        return False
+    with db_connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return ('ENABLE_FTS5',) in cursor.fetchall()
+
+
+def backend():
+    """The backend named by ``SEARCH_BACKEND``; 'auto' picks fts5 where
+    this SQLite has it (migration 0020 creates the table only then)."""
+    name = settings.SEARCH_BACKEND
+    if name not in _backends:
+        resolved = name
+        if name == 'auto':
+            resolved = 'fts5' if fts5_available() else 'inverted'
+        if resolved == 'fts5':
+            _backends[name] = FTS5Backend()
+        else:
+            _backends[name] = InvertedIndexBackend(settings.SEARCH_INDEX_DIR)
+    return _backends[name]
+
+
+def search(query):
+    return SearchResults(backend(), query)
+
+
+def index(posts):
+    backend().index(posts)
+
+
+def remove(post_ids):
+    backend().remove(post_ids)
+
+
+def rebuild():
+    backend().rebuild()
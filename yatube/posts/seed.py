@@ -0,0 +1,246 @@
+"""Synthetic users, groups, posts, comments, follows and chat messages in
+bulk, for testing at scale.
+
+Rows are built in Python and inserted with ``bulk_create``, one
+transaction per batch of ``batch_size`` rows, with signals bypassed.
+Post dates are spread over the last ``days`` days and comments come
+after their post. Texts are drawn from a pool of Faker sentences, so
+building a row costs no Faker call. The period ends on a date derived
+from ``seed`` rather than today, so the same ``seed`` gives the same
+data set on an empty database, dates included.
+
+Signals would have maintained the counters, the search index and the
+subscription feeds, so ``populate`` rebuilds them at the end. A
+follower's feed gets all the posts of the authors they follow, as
+after a follow on the site (see posts.timeline). Of the cached pages
+only the main feed can show the new rows, the users and groups being
+new, so its generation is bumped; other caches are left alone.
+
+``bulk_load`` relaxes SQLite durability while it loads: a crash loses
+the database, so use it on throwaway databases only.
+"""
+import itertools
+import random
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Max
+from faker import Faker
+
+from chat.models import DEFAULT_ROOM, Message
+from core.cache import bump_generation
+from . import counters, search, timeline
+from .cache import FEED
+from .models import Comment, Follow, Group, Post, TimelineEntry, User
+
+BATCH_SIZE = 5000
+SENTENCES = 2000
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+# No fsync and an in-memory rollback journal and temp store: several
+# times faster inserts, and a crash corrupts the database.
+BULK_LOAD_PRAGMAS = {
+    'synchronous': 'OFF',
+    'journal_mode': 'MEMORY',
+    'temp_store': 'MEMORY',
+    'cache_size': '-262144',  # KiB
+}
+
+
+@contextmanager
+def bulk_load(db_connection=connection):
+    """Apply ``BULK_LOAD_PRAGMAS`` to an SQLite connection while in the
+    block; a no-op on other databases and inside a transaction, where
+    SQLite refuses to change them."""
+    if db_connection.vendor != 'sqlite' or db_connection.in_atomic_block:
+        yield
+        return
+    saved = {}
+    with db_connection.cursor() as cursor:
+        for name, value in BULK_LOAD_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name}')
+            saved[name] = cursor.fetchone()[0]
+            cursor.execute(f'PRAGMA {name} = {value}')
+    try:
+        yield
+    finally:
+        with db_connection.cursor() as cursor:
+            for name, value in saved.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@contextmanager
+def _explicit_dates():
+    """Keep the dates set on new posts and comments: ``auto_now`` and
+    ``auto_now_add`` would overwrite them. Not thread-safe."""
+    fields = [Post._meta.get_field('pub_date'),
+              Post._meta.get_field('updated'),
+              Comment._meta.get_field('pub_date')]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def end_date(seed):
+    """End of the period seeded with ``seed``: within a year of EPOCH."""
+    return EPOCH + timedelta(days=seed % 366)
+
+
+def _max_pk(model):
+    return model.objects.aggregate(pk=Max('pk'))['pk'] or 0
+
+
+def _new_pks(model, start):
+    """Primary keys above ``start`` in insertion order."""
+    return list(model.objects.filter(pk__gt=start).order_by('pk').values_list(
+        'pk', flat=True).iterator())
+
+
+class Seeder:
+
+    def __init__(self, seed, days, batch_size, progress):
+        self.rng = random.Random(seed)
+        fake = Faker('ru_RU')
+        fake.seed_instance(seed)
+        self.fake = fake
+        self.sentences = [fake.sentence() for _ in range(SENTENCES)]
+        self.end = end_date(seed)
+        self.start = self.end - timedelta(days=days)
+        self.batch_size = batch_size
+        self.progress = progress or (lambda label, done, total: None)
+
+    def insert(self, model, objects, total):
+        done = 0
+        self.progress(model._meta.label, done, total)
+        objects = iter(objects)
+        while batch := list(itertools.islice(objects, self.batch_size)):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            done += len(batch)
+            self.progress(model._meta.label, done, total)
+
+    def text(self, sentences, limit=None):
+        text = ' '.join(self.rng.choices(
+            self.sentences, k=self.rng.randint(1, sentences)))
+        return text[:limit]
+
+    def dates(self, count):
+        """``count`` ascending random dates in the seeded period."""
+        span = (self.end - self.start).total_seconds()
+        return [self.start + timedelta(seconds=offset) for offset in sorted(
+            self.rng.uniform(0, span) for _ in range(count))]
+
+    def users(self, count):
+        start = _max_pk(User)
+        self.usernames = [
+            f'{self.fake.user_name()[:100]}-{start + number}'
+            for number in range(count)]
+        self.insert(User, (
+            User(username=username, first_name=self.fake.first_name(),
+                 last_name=self.fake.last_name(), password='!')
+            for username in self.usernames), count)
+        self.user_ids = _new_pks(User, start)
+
+    def groups(self, count):
+        start = _max_pk(Group)
+        self.insert(Group, (
+            Group(title=self.fake.sentence(nb_words=3)[:200],
+                  slug=f'group-{start + number}',
+                  description=self.text(3, 400))
+            for number in range(count)), count)
+        self.group_ids = _new_pks(Group, start)
+
+    def follows(self, count):
+        """Every user follows ``count`` other users."""
+        self.follows_start = _max_pk(Follow)
+        count = max(0, min(count, len(self.user_ids) - 1))
+
+        def follows():
+            for user_id in self.user_ids:
+                authors = self.rng.sample(self.user_ids, count + 1)
+                for author_id in [pk for pk in authors
+                                  if pk != user_id][:count]:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        self.insert(Follow, follows(), count * len(self.user_ids))
+
+    def posts(self, count):
+        start = _max_pk(Post)
+        self.post_dates = self.dates(count)
+        self.post_authors = [self.rng.choice(self.user_ids)
+                             for _ in range(count)]
+        groups = self.group_ids + [None] * len(self.group_ids)
+        self.insert(Post, (
+            Post(text=self.text(3, 200), author_id=author_id,
+                 group_id=self.rng.choice(groups) if groups else None,
+                 pub_date=pub_date, updated=pub_date)
+            for author_id, pub_date in zip(self.post_authors,
+                                           self.post_dates)), count)
+        self.post_ids = _new_pks(Post, start)
+
+    def comments(self, count):
+        if not self.post_ids:
+            return
+
+        def comments():
+            for _ in range(count):
+                index = self.rng.randrange(len(self.post_ids))
+                after = self.post_dates[index]
+                yield Comment(
+                    post_id=self.post_ids[index],
+                    author_id=self.rng.choice(self.user_ids),
+                    text=self.text(2),
+                    pub_date=after + (self.end - after) * self.rng.random())
+
+        self.insert(Comment, comments(), count)
+
+    def messages(self, count, rooms):
+        rooms = [DEFAULT_ROOM] + [f'room_{number}'
+                                  for number in range(1, rooms)]
+        self.insert(Message, (
+            Message(room=self.rng.choice(rooms),
+                    username=self.rng.choice(self.usernames)[:10],
+                    message=self.text(2), pub_date=pub_date)
+            for pub_date in self.dates(count)), count)
+
+    def timelines(self):
+        cache.delete(timeline.PROLIFIC_CACHE_KEY)
+        follows = Follow.objects.filter(pk__gt=self.follows_start).exclude(
+            author_id__in=timeline.prolific_author_ids())
+        followers = defaultdict(list)
+        for user_id, author_id in follows.values_list(
+                'user_id', 'author_id').iterator():
+            followers[author_id].append(user_id)
+        posts = Counter(self.post_authors)
+        self.insert(TimelineEntry, itertools.chain.from_iterable(
+            timeline.entries(user_ids, author_id)
+            for author_id, user_ids in followers.items()), sum(
+                len(user_ids) * posts[author_id]
+                for author_id, user_ids in followers.items()))
+
+
+def populate(users, posts, groups=20, follows=20, comments=0, messages=0,
+             rooms=1, days=365, seed=0, batch_size=BATCH_SIZE,
+             progress=None):
+    """Insert the given numbers of rows; ``follows`` is per user.
+    ``progress(model label, rows done, total)`` is called before the
+    first batch of a model and after every batch."""
+    seeder = Seeder(seed, days, batch_size, progress)
+    seeder.users(users)
+    seeder.groups(groups)
+    seeder.follows(follows)
+    with _explicit_dates():
+        seeder.posts(posts)
+        seeder.comments(comments)
+    seeder.messages(messages, rooms)
+    seeder.timelines()
+    counters.rebuild()
+    search.rebuild()
+    bump_generation(FEED)
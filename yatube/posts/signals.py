@@ -0,0 +1,169 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core.cache import bump_generation, delete_fragment
+from . import counters, follows, search, timeline
+from .cache import (FEED, POST_CARD_FRAGMENT, author_namespace,
+                    drop_post_caches, drop_post_cards, group_namespace,
+                    post_card_vary_on, post_namespaces)
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_state(sender, instance, **kwargs):
+    instance._previous_group_id, previous_updated = sender.objects.filter(
+        pk=instance.pk).values_list('group_id', 'updated').first() or (
+            None, None)
+    if previous_updated is not None:
+        delete_fragment(POST_CARD_FRAGMENT,
+                        post_card_vary_on(instance.pk, previous_updated))
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    if created:
+        counters.incr(counters.post_keys(instance))
+        timeline.fan_out(instance)
+        return
+    previous_group_id = instance._previous_group_id
+    if previous_group_id != instance.group_id:
+        if previous_group_id is not None:
+            counters.incr(
+                [counters.key('group_posts', previous_group_id)], -1)
+        if instance.group_id is not None:
+            counters.incr([counters.key('group_posts', instance.group_id)])
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.incr(counters.post_keys(instance), -1)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, **kwargs):
+    search.index([instance])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    search.remove([instance.pk])
+
+
+@receiver(post_delete, sender=Post)
+def drop_post_card(sender, instance, **kwargs):
+    delete_fragment(POST_CARD_FRAGMENT,
+                    post_card_vary_on(instance.pk, instance.updated))
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post_feeds(sender, instance, **kwargs):
+    bump_generation(*post_namespaces(
+        instance, getattr(instance, '_previous_group_id', None)))
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post_feeds(sender, instance, **kwargs):
+    bump_generation(*post_namespaces(instance))
+
+
+def comment_count_changed(post_id, delta):
+    post = Post.objects.filter(pk=post_id).only(
+        'author', 'group', 'updated').first()
+    if post is None:
+        return
+    counters.incr_comment_count(post_id, delta)
+    drop_post_caches(post)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created and instance.post_id is not None:
+        comment_count_changed(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, origin=None, **kwargs):
+    # Comments deleted along with their posts are not counted down: that
+    # would cost queries per comment for posts that are gone.
+    if instance.post_id is None or isinstance(origin, Post) or (
+            getattr(origin, 'model', None) is Post):
+        return
+    comment_count_changed(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_feeds(sender, instance, **kwargs):
+    bump_generation(FEED, group_namespace(instance.pk))
+
+
+@receiver(pre_save, sender=Group)
+def remember_previous_title(sender, instance, **kwargs):
+    instance._previous_title, instance._previous_slug = (
+        sender.objects.filter(pk=instance.pk).values_list(
+            'title', 'slug').first() or (None, None))
+
+
+def forget_group_links(group):
+    """Drop the cards and the profile pages of posts in ``group``: they
+    link to it by slug."""
+    drop_post_cards(group.posts.all())
+    bump_generation(*(author_namespace(author_id) for author_id in (
+        group.posts.order_by().values_list('author_id', flat=True)
+        .distinct())))
+
+
+@receiver(post_save, sender=Group)
+def drop_cards_of_moved_group(sender, instance, created, **kwargs):
+    if not created and instance._previous_slug != instance.slug:
+        forget_group_links(instance)
+
+
+@receiver(post_save, sender=Group)
+def reindex_renamed_group(sender, instance, created, **kwargs):
+    if not created and instance._previous_title != instance.title:
+        search.index(instance.posts.select_related('group'))
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_posts(sender, instance, **kwargs):
+    instance._post_ids = list(instance.posts.values_list('pk', flat=True))
+    # SET_NULL is an update(), which leaves the cards with the group.
+    forget_group_links(instance)
+
+
+@receiver(post_delete, sender=Group)
+def reindex_ungrouped_posts(sender, instance, **kwargs):
+    # Posts keep their text and lose the group title (SET_NULL).
+    search.index(Post.objects.filter(pk__in=instance._post_ids))
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_username(sender, instance, update_fields, **kwargs):
+    # Logins save last_login only.
+    if update_fields and 'username' not in update_fields:
+        instance._previous_username = instance.username
+        return
+    instance._previous_username = sender.objects.filter(
+        pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_feeds(sender, instance, created, **kwargs):
+    # Pages and cards show the username.
+    if created or instance._previous_username == instance.username:
+        return
+    drop_post_cards(instance.posts.all())
+    bump_generation(FEED, author_namespace(instance.pk))
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, **kwargs):
+    if created:
+        follows.followed(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    follows.unfollowed(instance.user_id, [instance.author_id])
@@ -0,0 +1,16 @@
+from django import template
+
+from posts import derivatives, thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts, name):
+    """Resolve the ``name`` thumbnails and the responsive image sources
+    of a page of posts (or one post) in one batch; renders nothing."""
+    if not hasattr(posts, '__iter__'):
+        posts = [posts]
+    thumbnails.attach(posts, name)
+    derivatives.attach(posts)
+    return ''
@@ -0,0 +1,122 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import counters, timeline
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedAPITest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='')
+        Post.objects.bulk_create(
+            Post(author=self.author, group=self.group, text=f'пост {i}')
+            for i in range(settings.COUNT_POSTS + 1))
+        counters.rebuild()
+        self.urls = {
+            'index': reverse('posts:api_index'),
+            'group': reverse('posts:api_group_list',
+                             kwargs={'slug': self.group.slug}),
+            'profile': reverse('posts:api_profile',
+                               kwargs={'username': self.author.username}),
+        }
+
+    def test_feeds_are_paged_by_cursor(self):
+        for name, url in self.urls.items():
+            with self.subTest(feed=name):
+                first = self.client.get(url).json()
+                self.assertEqual(len(first['results']), settings.COUNT_POSTS)
+                self.assertEqual(first['results'][0]['author'], 'author')
+                self.assertEqual(first['results'][0]['group'], 'test-slug')
+                second = self.client.get(
+                    url, {'cursor': first['next_cursor']}).json()
+                self.assertEqual(len(second['results']), 1)
+                self.assertIsNone(second['next_cursor'])
+
+    def test_original_image_is_linked_once_cleaned(self):
+        post_id = self.client.get(self.urls['index']).json()[
+            'results'][0]['id']
+        posts = Post.objects.filter(pk=post_id)
+        posts.update(image='posts/photo.jpg', thumbnails_ready=False)
+        first = self.client.get(self.urls['index']).json()['results'][0]
+        self.assertIsNone(first['image'])
+        posts.update(thumbnails_ready=True)
+        first = self.client.get(self.urls['index']).json()['results'][0]
+        self.assertTrue(first['image'].endswith('posts/photo.jpg'))
+
+    def test_unchanged_page_is_not_modified(self):
+        url = self.urls['index']
+        response = self.client.get(url)
+        self.assertIn('no-cache', response.headers['Cache-Control'])
+        self.assertIn('Last-Modified', response.headers)
+        with self.assertNumQueries(1):
+            cached = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response.headers['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b'')
+        not_modified = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response.headers['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_changes_on_the_page_change_the_etag(self):
+        url = self.urls['index']
+        etag = self.client.get(url).headers['ETag']
+        post = Post.objects.first()
+        Comment.objects.create(post=post, author=self.author, text='Ок')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['comments'], 1)
+        etag = response.headers['ETag']
+        post.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_removed_post_moves_last_modified(self):
+        url = self.urls['index']
+        last_modified = self.client.get(url).headers['Last-Modified']
+        later = time.time() + 10
+        with mock.patch('time.time', return_value=later):
+            Post.objects.order_by('-pub_date', '-pk').first().delete()
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+    def test_renamed_author_and_group_change_the_etag(self):
+        url = self.urls['index']
+        etag = self.client.get(url).headers['ETag']
+        self.author.username = 'renamed'
+        self.author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['author'], 'renamed')
+        etag = response.headers['ETag']
+        self.group.slug = 'new-slug'
+        self.group.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['group'], 'new-slug')
+
+    def test_follow_feed_is_private(self):
+        self.assertEqual(
+            self.client.get(reverse('posts:api_follow_index')).status_code,
+            401)
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        timeline.backfill(reader.pk, self.author.pk)
+        self.client.force_login(reader)
+        response = self.client.get(reverse('posts:api_follow_index'))
+        self.assertEqual(len(response.json()['results']),
+                         settings.COUNT_POSTS)
+        self.assertIn('private', response.headers['Cache-Control'])
+        self.assertIn('Cookie', response.headers['Vary'])
@@ -0,0 +1,43 @@
+from django.test import TestCase, override_settings
+
+from .. import benchmark
+from ..models import Follow, Post, User
+
+
+class BenchmarkTest(TestCase):
+
+    def test_generate_and_measure(self):
+        benchmark.generate(users=20, posts=50, groups=3, follows=2,
+                           comments=5)
+        self.assertEqual(User.objects.count(), 21)
+        self.assertEqual(Post.objects.count(), 50)
+        self.assertEqual(Follow.objects.filter(
+            user__username=benchmark.READER).count(), 20)
+        report = {'pages': benchmark.measure(requests=2)}
+        self.assertEqual(set(report['pages']), {
+            'index', 'group_list', 'profile', 'post_detail',
+            'follow_index'})
+        for metrics in report['pages'].values():
+            self.assertGreater(metrics['queries'], 0)
+            self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+        self.assertEqual(benchmark.compare(report, report), [])
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django_redis.cache.RedisCache',
+                    'LOCATION': 'redis://cache:6379/0'},
+        'pages': {'BACKEND': 'core.cache_backends.StaleWhileRevalidateCache',
+                  'OPTIONS': {'TARGET': 'default'}},
+    })
+    def test_local_caches(self):
+        caches = benchmark.local_caches()
+        self.assertEqual(caches['default']['BACKEND'],
+                         'django.core.cache.backends.locmem.LocMemCache')
+        self.assertEqual(caches['pages']['OPTIONS'], {'TARGET': 'default'})
+
+    def test_compare_reports_regressions(self):
+        baseline = {'pages': {'index': {
+            'p50_ms': 10, 'p99_ms': 20, 'queries': 3, 'memory_kib': 100}}}
+        report = {'pages': {'index': {
+            'p50_ms': 11, 'p99_ms': 40, 'queries': 4, 'memory_kib': 100}}}
+        self.assertEqual(benchmark.compare(report, baseline), [
+            ('index', 'p99_ms', 20, 40), ('index', 'queries', 3, 4)])
@@ -2,8 +2,10 @@ from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
 from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
 
 from ..models import Post, Group
+from ..cache import POST_CARD_FRAGMENT, post_card_vary_on
 
 User = get_user_model()
 
@@ -15,6 +17,7 @@ class CachePagesTests(TestCase):
         super().setUpClass()
 
     def setUp(self) -> None:
+        cache.clear()
         self.user = User.objects.create_user(username='NoName')
 
         self.group = Group.objects.create(
@@ -29,12 +32,118 @@ class CachePagesTests(TestCase):
         )
 
     def test_cache_index_page(self):
+        self.client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            response_from_cache = self.client.get(reverse('posts:index'))
+        self.assertContains(response_from_cache, self.post.text)
+
+    def test_index_page_invalidated_on_delete(self):
         response_before_del_post = self.client.get(reverse('posts:index'))
         self.post.delete()
         response_after_del_post = self.client.get(reverse('posts:index'))
-        self.assertEqual(response_before_del_post.content,
-                         response_after_del_post.content)
-        cache.clear()
-        response_after_cache_clear = self.client.get(reverse('posts:index'))
-        self.assertNotEqual(response_after_del_post.content,
-                            response_after_cache_clear.content)
+        self.assertNotEqual(response_before_del_post.content,
+                            response_after_del_post.content)
+        self.assertNotContains(response_after_del_post, self.post.text)
+
+    def test_feed_pages_invalidated_on_create(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in urls:
+            self.client.get(url)
+        Post.objects.create(author=self.user, text='Новый пост',
+                            group=self.group)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Новый пост')
+
+    def test_group_page_invalidated_on_group_change(self):
+        other_group = Group.objects.create(
+            title='Другая группа', slug='other-slug', description='')
+        other_url = reverse('posts:group_list',
+                            kwargs={'slug': other_group.slug})
+        self.client.get(other_url)
+        self.post.group = other_group
+        self.post.save()
+        self.assertContains(self.client.get(other_url), self.post.text)
+        self.assertNotContains(
+            self.client.get(reverse('posts:group_list',
+                                    kwargs={'slug': self.group.slug})),
+            self.post.text)
+
+    def test_post_card_is_cached_and_invalidated_on_edit(self):
+        group_url = reverse('posts:group_list',
+                            kwargs={'slug': self.group.slug})
+        card_key = make_template_fragment_key(
+            POST_CARD_FRAGMENT,
+            post_card_vary_on(self.post.pk, self.post.updated))
+        self.client.get(group_url)
+        self.assertIsNotNone(cache.get(card_key))
+
+        self.post.text = 'Отредактированный текст'
+        self.post.save()
+        self.assertIsNone(cache.get(card_key))
+        response = self.client.get(group_url)
+        self.assertContains(response, 'Отредактированный текст')
+
+    def test_post_card_is_dropped_on_delete(self):
+        self.client.get(reverse('posts:profile',
+                                kwargs={'username': self.user}))
+        card_key = make_template_fragment_key(
+            POST_CARD_FRAGMENT,
+            post_card_vary_on(self.post.pk, self.post.updated))
+        self.assertIsNotNone(cache.get(card_key))
+        self.post.delete()
+        self.assertIsNone(cache.get(card_key))
+
+    def test_post_card_is_dropped_on_group_slug_change(self):
+        self.client.get(reverse('posts:index'))
+        self.group.slug = 'new-slug'
+        self.group.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, reverse(
+            'posts:group_list', kwargs={'slug': 'new-slug'}))
+        self.assertNotContains(response, reverse(
+            'posts:group_list', kwargs={'slug': 'test-slug'}))
+
+    def test_post_card_is_dropped_on_group_delete(self):
+        self.client.get(reverse('posts:index'))
+        self.group.delete()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.text)
+        self.assertNotContains(response, reverse(
+            'posts:group_list', kwargs={'slug': 'test-slug'}))
+
+    def test_profile_follows_group_slug_change_and_delete(self):
+        url = reverse('posts:profile', kwargs={'username': 'NoName'})
+        old = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        new = reverse('posts:group_list', kwargs={'slug': 'new-slug'})
+        reader = User.objects.create_user(username='reader')
+        logged_in = self.client_class()
+        logged_in.force_login(reader)
+        for client in (self.client, logged_in):
+            self.assertContains(client.get(url), old)
+        self.group.slug = 'new-slug'
+        self.group.save()
+        for client in (self.client, logged_in):
+            with self.subTest(logged_in=client is logged_in):
+                response = client.get(url)
+                self.assertContains(response, new)
+                self.assertNotContains(response, old)
+        self.group.delete()
+        for client in (self.client, logged_in):
+            with self.subTest(logged_in=client is logged_in):
+                response = client.get(url)
+                self.assertContains(response, self.post.text)
+                self.assertNotContains(response, new)
+
+    def test_post_card_is_dropped_on_author_rename(self):
+        self.client.get(reverse('posts:index'))
+        self.user.username = 'Renamed'
+        self.user.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, reverse(
+            'posts:profile', kwargs={'username': 'Renamed'}))
+        self.assertNotContains(response, 'NoName')
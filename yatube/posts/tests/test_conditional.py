@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, modify_settings
+from django.urls import reverse
+
+from .. import counters
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+@modify_settings(MIDDLEWARE={
+    'remove': 'core.middleware.AnonymousPageCacheMiddleware'})
+class ConditionalPageTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='')
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Тестовый пост')
+        counters.rebuild()
+        self.urls = {
+            'index': reverse('posts:index'),
+            'group_list': reverse('posts:group_list',
+                                  kwargs={'slug': self.group.slug}),
+            'profile': reverse('posts:profile',
+                               kwargs={'username': self.author.username}),
+        }
+
+    def revalidate(self, url, response, **headers):
+        return self.client.get(
+            url, HTTP_IF_NONE_MATCH=response.headers['ETag'], **headers)
+
+    def test_anonymous_pages_are_public_and_revalidated(self):
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                response = self.client.get(url)
+                self.assertIn('public', response.headers['Cache-Control'])
+                self.assertIn('Cookie', response.headers['Vary'])
+                self.assertIn('Last-Modified', response.headers)
+                # At most the lookup of the group or the author.
+                with self.assertNumQueries(0 if name == 'index' else 1):
+                    cached = self.revalidate(url, response)
+                self.assertEqual(cached.status_code, 304)
+                not_modified = self.client.get(
+                    url,
+                    HTTP_IF_MODIFIED_SINCE=response.headers['Last-Modified'])
+                self.assertEqual(not_modified.status_code, 304)
+
+    def test_new_post_changes_the_validators(self):
+        responses = {name: self.client.get(url)
+                     for name, url in self.urls.items()}
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Новый пост')
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                self.assertEqual(
+                    self.revalidate(url, responses[name]).status_code, 200)
+
+    def test_follow_changes_the_profile(self):
+        url = self.urls['profile']
+        response = self.client.get(url)
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_query_string_is_part_of_the_etag(self):
+        response = self.client.get(self.urls['index'])
+        other = self.revalidate(self.urls['index'] + '?page=1', response)
+        self.assertEqual(other.status_code, 200)
+
+    def test_logged_in_pages_are_private(self):
+        self.client.force_login(self.author)
+        response = self.client.get(self.urls['index'])
+        self.assertIn('private', response.headers['Cache-Control'])
+        self.assertNotIn('ETag', response.headers)
+
+    def test_missing_group_is_not_found(self):
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
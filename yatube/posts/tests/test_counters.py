@@ -0,0 +1,158 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, modify_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import counters
+from ..models import Comment, Counter, Follow, Group, Post
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='NoName')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание группы'
+        )
+        self.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание группы'
+        )
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Тестовое описание поста',
+            group=self.group
+        )
+        self.keys = {
+            'total': counters.key('posts'),
+            'author': counters.key('author_posts', self.user.pk),
+            'group': counters.key('group_posts', self.group.pk),
+            'other_group': counters.key('group_posts', self.other_group.pk),
+        }
+
+    def get(self, name):
+        return counters.total([self.keys[name]])
+
+    def test_missing_counter_is_computed(self):
+        self.assertFalse(Counter.objects.exists())
+        self.assertEqual(self.get('author'), 1)
+        self.assertTrue(
+            Counter.objects.filter(key=self.keys['author']).exists())
+
+    def test_counters_follow_create_edit_delete(self):
+        for name in self.keys:
+            self.get(name)
+        Post.objects.create(author=self.user, text='второй пост')
+        self.assertEqual(self.get('total'), 2)
+        self.assertEqual(self.get('author'), 2)
+        self.assertEqual(self.get('group'), 1)
+
+        self.post.group = self.other_group
+        self.post.save()
+        self.assertEqual(self.get('group'), 0)
+        self.assertEqual(self.get('other_group'), 1)
+
+        self.post.delete()
+        self.assertEqual(self.get('total'), 1)
+        self.assertEqual(self.get('other_group'), 0)
+
+    def test_rebuild_fixes_drift(self):
+        self.get('author')
+        Post.objects.bulk_create(
+            [Post(author=self.user, text=f'пост {i}') for i in range(3)])
+        self.assertEqual(self.get('author'), 1)
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(self.get('author'), 4)
+        self.assertEqual(self.get('total'), 4)
+        self.assertEqual(self.get('group'), 1)
+
+    def test_comment_count_moves_with_comments(self):
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='комментарий')
+        Comment.objects.create(
+            post=self.post, author=self.user, text='ещё комментарий')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+    def test_deleting_a_post_does_not_count_its_comments(self):
+        post = Post.objects.create(author=self.user, text='Вирусный')
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.user, text=str(number))
+            for number in range(20))
+        with CaptureQueriesContext(connection) as queries:
+            post.delete()
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT "posts_post"')
+            or 'comment_count' in query['sql']])
+        self.assertFalse(Comment.objects.filter(post_id=post.pk).exists())
+        Post.objects.filter(pk=self.post.pk).delete()
+        self.assertFalse(Comment.objects.exists())
+
+    def test_comment_count_never_goes_negative(self):
+        # Comments from bulk_create are not counted.
+        Comment.objects.bulk_create(
+            [Comment(post=self.post, author=self.user, text='Тихий')])
+        Comment.objects.filter(post=self.post).delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_rebuild_fixes_comment_counts(self):
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, text=f'комментарий {i}')
+            for i in range(3))
+        call_command('rebuild_counters', 'comment_count', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 3)
+
+    def test_follow_counters(self):
+        reader = User.objects.create_user(username='reader')
+        keys = counters.profile_keys(self.user.pk)
+        counters.rebuild()
+        follow = Follow.objects.create(user=reader, author=self.user)
+        self.assertEqual(counters.get(keys)[keys[1]], 1)
+        self.assertEqual(
+            counters.total([counters.key('following', reader.pk)]), 1)
+        follow.delete()
+        self.assertEqual(counters.get(keys)[keys[1]], 0)
+
+    @modify_settings(MIDDLEWARE={
+        'remove': 'core.middleware.AnonymousPageCacheMiddleware'})
+    def test_profile_counts_in_one_query(self):
+        counters.rebuild()
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        counter_queries = [query for query in queries
+                           if 'posts_counter' in query['sql']]
+        self.assertEqual(len(counter_queries), 1)
+        self.assertEqual(response.context['count_posts'], 1)
+        self.assertEqual(response.context['count_followers'], 0)
+
+    def test_feeds_do_not_count_posts(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in urls:
+            for params in ({}, {'page': 1}):
+                with self.subTest(url=url, params=params):
+                    counters.rebuild()
+                    with CaptureQueriesContext(connection) as queries:
+                        self.client.get(url, params)
+                    for query in queries:
+                        self.assertNotIn('COUNT(', query['sql'])
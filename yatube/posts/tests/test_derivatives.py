@@ -0,0 +1,106 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from .. import derivatives
+from ..models import Post
+
+User = get_user_model()
+
+EXIF_ORIENTATION = 0x0112
+EXIF_GPS_INFO = 0x8825
+
+
+def photo(width=800, height=400, orientation=6):
+    """A JPEG that must be rotated by its EXIF orientation; without EXIF
+    if ``orientation`` is None."""
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[EXIF_ORIENTATION] = orientation
+        exif[EXIF_GPS_INFO] = {2: (55.0, 45.0, 0.0)}
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'red').save(
+        buffer, 'JPEG', **({'exif': exif.tobytes()} if exif else {}))
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(),
+                              content_type='image/jpeg')
+
+
+@override_settings(POST_IMAGE_WIDTHS=(320, 640, 960),
+                   POST_IMAGE_FORMATS=('webp', 'jpeg'))
+class ImageDerivativesTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        cache.clear()
+        user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(author=user, text='Фото',
+                                        image=photo())
+        derivatives.render(self.post)
+
+    def test_variants_are_rotated_scaled_and_stripped(self):
+        variants = self.post.derivatives.order_by('width', 'format')
+        self.assertEqual(
+            [(variant.format, variant.width, variant.height)
+             for variant in variants],
+            [('jpeg', 320, 640), ('webp', 320, 640),
+             ('jpeg', 400, 800), ('webp', 400, 800)])
+        for variant in variants:
+            with self.subTest(variant=variant.file.name):
+                with variant.file.open('rb') as file:
+                    image = Image.open(file)
+                    self.assertEqual(image.format, variant.format.upper())
+                    self.assertEqual(image.size,
+                                     (variant.width, variant.height))
+                    self.assertNotIn(EXIF_ORIENTATION, image.getexif())
+
+    def test_sources_are_attached_in_one_query(self):
+        posts = [Post.objects.get(pk=self.post.pk)]
+        with self.assertNumQueries(1):
+            derivatives.attach(posts)
+        webp, jpeg = posts[0].image_sources
+        self.assertEqual(webp['type'], 'image/webp')
+        self.assertEqual(jpeg['type'], 'image/jpeg')
+        self.assertRegex(webp['srcset'],
+                         r'-320\.webp 320w, .*-400\.webp 400w$')
+        with self.assertNumQueries(0):
+            derivatives.attach(posts)
+
+    def test_rendering_again_replaces_variants(self):
+        derivatives.render(self.post)
+        _, files = default_storage.listdir(f'derivatives/{self.post.pk}')
+        self.assertEqual(len(files), 4)
+        self.assertEqual(self.post.derivatives.count(), 4)
+
+    @override_settings(POST_IMAGE_MAX_SIDE=200)
+    def test_large_original_is_scaled_down(self):
+        name = derivatives.clean_original(self.post)
+        with default_storage.open(name, 'rb') as file:
+            image = Image.open(file)
+            self.assertEqual(image.size, (100, 200))
+            self.assertNotIn(EXIF_ORIENTATION, image.getexif())
+
+    def test_original_with_metadata_is_stripped(self):
+        with self.post.image.open('rb') as file:
+            self.assertIn(EXIF_GPS_INFO, Image.open(file).getexif())
+        name = derivatives.clean_original(self.post)
+        with default_storage.open(name, 'rb') as file:
+            image = Image.open(file)
+            self.assertEqual(image.size, (400, 800))
+            self.assertFalse(image.getexif())
+
+    def test_clean_original_within_limit_is_kept(self):
+        self.post.image = photo(orientation=None)
+        self.post.save()
+        self.assertIsNone(derivatives.clean_original(self.post))
@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import follow_graph, follows
+from ..models import Follow, Post
+
+User = get_user_model()
+
+
+class FollowGraphTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.authors = [User.objects.create_user(username=f'author{i}')
+                        for i in range(3)]
+        self.posts = [Post.objects.create(author=author, text='пост')
+                      for author in self.authors]
+        follows.follow(self.reader, self.authors[2])
+        follows.follow(self.reader, self.authors[0])
+
+    def fresh_reader(self):
+        return User.objects.get(pk=self.reader.pk)
+
+    def test_set_is_sorted_and_cached(self):
+        reader = self.fresh_reader()
+        with self.assertNumQueries(1):
+            _, authors = follow_graph.followed_authors(reader)
+        self.assertEqual(list(authors),
+                         [self.authors[0].pk, self.authors[2].pk])
+        reader = self.fresh_reader()
+        with self.assertNumQueries(0):
+            follow_graph.followed_authors(reader)
+
+    def test_followed_on_page_without_queries(self):
+        reader = self.fresh_reader()
+        follow_graph.followed_authors(reader)
+        with self.assertNumQueries(0):
+            followed = follow_graph.followed_on(self.posts, reader)
+        self.assertEqual(followed, [self.authors[0], self.authors[2]])
+        self.assertEqual(
+            follow_graph.followed_on(self.posts, AnonymousUser()), [])
+
+    def test_follow_and_unfollow_invalidate(self):
+        generation, _ = follow_graph.followed_authors(self.fresh_reader())
+        follows.follow(self.reader, self.authors[1])
+        reader = self.fresh_reader()
+        self.assertNotEqual(follow_graph.followed_authors(reader)[0],
+                            generation)
+        self.assertTrue(follow_graph.is_following(reader, self.authors[1].pk))
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertFalse(follow_graph.is_following(
+            self.fresh_reader(), self.authors[0].pk))
+
+    def test_feed_cards_show_the_badge(self):
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Вы подписаны на author0')
+        self.assertNotContains(response, 'Вы подписаны на author1')
+        follows.unfollow(self.reader, self.authors[0])
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Вы подписаны на author0')
+
+    def test_badges_are_not_cached_with_the_shared_page(self):
+        self.client.force_login(self.reader)
+        self.client.get(reverse('posts:index'))
+        other = User.objects.create_user(username='other')
+        self.client.force_login(other)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, self.posts[0].text)
+        self.assertNotContains(response, 'Вы подписаны на')
@@ -0,0 +1,110 @@
+import json
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import counters, follows
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class FollowServiceTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+        self.authors = [User.objects.create_user(username=f'author{i}')
+                        for i in range(3)]
+        for author in self.authors:
+            Post.objects.create(author=author, text=f'пост {author}')
+        counters.rebuild()
+
+    def counts(self):
+        keys = [counters.key('following', self.user.pk),
+                *(counters.key('followers', author.pk)
+                  for author in self.authors)]
+        values = counters.get(keys)
+        return [values[key] for key in keys]
+
+    def test_follow_is_one_insert_and_idempotent(self):
+        author = self.authors[0]
+        self.assertTrue(follows.follow(self.user, author))
+        self.assertFalse(follows.follow(self.user, author))
+        self.assertFalse(follows.follow(self.user, self.user))
+        self.assertEqual(Follow.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(self.counts(), [1, 1, 0, 0])
+        self.assertTrue(follows.unfollow(self.user, author))
+        self.assertFalse(follows.unfollow(self.user, author))
+        self.assertEqual(self.counts(), [0, 0, 0, 0])
+
+    def test_many_at_once(self):
+        follows.follow(self.user, self.authors[0])
+        ids = [author.pk for author in self.authors]
+        new = follows.follow_many(self.user, [*ids, self.user.pk])
+        self.assertEqual(new, ids[1:])
+        self.assertEqual(follows.follow_many(self.user, ids), [])
+        self.assertEqual(self.counts(), [3, 1, 1, 1])
+        self.assertEqual(self.user.timeline.count(), 3)
+
+        self.assertEqual(follows.unfollow_many(self.user, ids[:2]), ids[:2])
+        self.assertEqual(follows.unfollow_many(self.user, ids[:2]), [])
+        self.assertEqual(self.counts(), [1, 0, 0, 1])
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(user=self.user).values_list(
+                'post__author', flat=True)), [ids[2]])
+
+    def test_many_at_once_without_returning(self):
+        with mock.patch.object(follows, '_returning', return_value=False):
+            self.test_many_at_once()
+
+    def test_rows_written_elsewhere_are_not_counted(self):
+        # As if a concurrent call had inserted and counted them.
+        ids = [author.pk for author in self.authors]
+        Follow.objects.bulk_create(
+            [Follow(user=self.user, author_id=pk) for pk in ids[:2]])
+        self.assertEqual(follows.follow_many(self.user, ids), ids[2:])
+        self.assertEqual(self.counts(), [1, 0, 0, 1])
+        Follow.objects.filter(user=self.user, author_id=ids[0]).delete()
+        self.assertEqual(follows.unfollow_many(self.user, ids), ids[1:])
+
+    def test_bulk_endpoint(self):
+        url = reverse('posts:api_follows_bulk')
+        body = {'follow': ['author0', 'author1', 'nobody'],
+                'unfollow': ['author2']}
+        self.assertEqual(self.client.post(
+            url, body, content_type='application/json').status_code, 401)
+        self.client.force_login(self.user)
+        follows.follow(self.user, self.authors[2])
+        response = self.client.post(url, body,
+                                    content_type='application/json')
+        self.assertEqual(response.json(), {
+            'followed': ['author0', 'author1'],
+            'unfollowed': ['author2'],
+            'unknown': ['nobody'],
+        })
+        self.assertEqual(self.counts(), [2, 1, 1, 0])
+        response = self.client.post(url, body,
+                                    content_type='application/json')
+        self.assertEqual(response.json()['followed'], [])
+        self.assertEqual(self.client.post(
+            url, json.dumps({'follow': 'author0'}),
+            content_type='application/json').status_code, 400)
+
+    def test_import_command(self):
+        follows.follow(self.user, self.authors[0])
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as file:
+            file.write('reader,author0\nreader,author1\nauthor1,author2\n'
+                       'reader,reader\nghost,author0\n')
+            file.flush()
+            call_command('import_follows', file.name,
+                         stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(Follow.objects.count(), 3)
+        self.assertEqual(self.counts(), [2, 1, 1, 1])
+        self.assertEqual(self.user.timeline.count(), 2)
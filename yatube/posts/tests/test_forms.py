@@ -80,6 +80,22 @@ class PostCreateFormTests(TestCase):
             )
         )
 
+    @override_settings(UPLOAD_MAX_BYTES=16)
+    def test_upload_over_the_limit_is_refused(self):
+        count_post = Post.objects.count()
+        response = self.authorized_client.post(
+            reverse('posts:post_create'), data={
+                'text': 'Большая картинка',
+                'image': SimpleUploadedFile(
+                    'big.gif', b'GIF89a' + b'x' * 64,
+                    content_type='image/gif'),
+            })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Post.objects.count(), count_post)
+        # Other views keep Django's upload handlers.
+        self.assertNotIn('core.uploads.BoundedUploadHandler',
+                         settings.FILE_UPLOAD_HANDLERS)
+
     def test_post_edit(self):
         post_count = Post.objects.count()
         old_text = self.post.text
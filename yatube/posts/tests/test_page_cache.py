@@ -0,0 +1,97 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core import cache_backends, middleware
+from .. import counters
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='')
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Тестовый пост')
+        counters.rebuild()
+        self.urls = {
+            'index': reverse('posts:index'),
+            'group_list': reverse('posts:group_list',
+                                  kwargs={'slug': self.group.slug}),
+            'profile': reverse('posts:profile',
+                               kwargs={'username': self.author.username}),
+            'post_detail': reverse('posts:post_detail',
+                                   kwargs={'post_id': self.post.pk}),
+        }
+
+    def test_second_visit_skips_the_database(self):
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                first = self.client.get(url)
+                self.assertEqual(first.headers['X-Page-Cache'], 'miss')
+                with self.assertNumQueries(0):
+                    second = self.client.get(url)
+                self.assertEqual(second.headers['X-Page-Cache'], 'hit')
+                self.assertEqual(second.content, first.content)
+                not_modified = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=first.headers['ETag'])
+                self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(middleware.stats(), {'hit': 8, 'miss': 4})
+
+    def test_changes_invalidate_pages(self):
+        for url in self.urls.values():
+            self.client.get(url)
+        Comment.objects.create(post=self.post, author=self.author, text='Ок')
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                response = self.client.get(url)
+                self.assertEqual(response.headers['X-Page-Cache'], 'miss')
+        self.group.title = 'Новое название'
+        self.group.save()
+        response = self.client.get(self.urls['group_list'])
+        self.assertContains(response, 'Новое название')
+
+    def test_sessions_and_users_bypass_the_cache(self):
+        url = self.urls['index']
+        self.client.get(url)
+        self.client.cookies['sessionid'] = 'anything'
+        self.assertNotIn('X-Page-Cache', self.client.get(url).headers)
+        self.client.force_login(self.author)
+        self.assertNotIn('X-Page-Cache', self.client.get(url).headers)
+
+    def test_waiting_request_gets_the_page_rendered_by_another(self):
+        url = self.urls['index']
+        self.client.get(url)
+        key = middleware.page_key(self.client.get(url).wsgi_request)
+        pages = middleware.page_cache()
+        namespaces = pages.get(key)
+        stored = cache.get(key)
+        pages.delete(key)
+        # Another worker is rendering: the lock is taken, no pointer yet.
+        self.assertIsNone(pages.get(key))
+        with mock.patch.object(cache_backends.time, 'sleep',
+                               side_effect=lambda _: cache.set(key, stored)):
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+        self.assertEqual(response.headers['X-Page-Cache'], 'hit')
+        self.assertEqual(pages.get(key), namespaces)
+
+    def test_request_renders_itself_when_the_lock_is_stuck(self):
+        url = self.urls['index']
+        self.client.get(url)
+        key = middleware.page_key(self.client.get(url).wsgi_request)
+        pages = middleware.page_cache()
+        pages.delete(key)
+        self.assertIsNone(pages.get(key))
+        with mock.patch.object(pages, 'lock_wait', 0.05):
+            response = self.client.get(url)
+        self.assertEqual(response.headers['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Тестовый пост')
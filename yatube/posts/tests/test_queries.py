@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import counters, timeline
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedQueryBudgetTest(TestCase):
+    """Feed pages cost the same number of queries for any page size."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание группы'
+        )
+        self.feeds = {
+            'index': (self.client, reverse('posts:index'), 1),
+            'group_list': (self.client, reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}), 2),
+            'profile': (self.client, reverse(
+                'posts:profile', kwargs={'username': self.author}), 3),
+            'follow_index': (
+                self.reader_client, reverse('posts:follow_index'), 3),
+        }
+
+    def add_posts(self, count):
+        Post.objects.bulk_create(
+            Post(author=self.author, group=self.group, text=f'пост {i}')
+            for i in range(count))
+        counters.rebuild()
+        timeline.backfill(self.reader.pk, self.author.pk)
+
+    def assert_budget(self):
+        for name, (client, url, budget) in self.feeds.items():
+            with self.subTest(feed=name):
+                cache.clear()
+                timeline.prolific_author_ids()
+                with self.assertNumQueries(budget):
+                    client.get(url)
+
+    def test_single_post_page(self):
+        self.add_posts(1)
+        self.assert_budget()
+
+    def test_full_page(self):
+        self.add_posts(settings.COUNT_POSTS)
+        self.assert_budget()
@@ -0,0 +1,144 @@
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class FTS5SearchTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        if not isinstance(search.backend(), search.FTS5Backend):
+            raise unittest.SkipTest('This SQLite has no FTS5')
+        super().setUpClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.group = Group.objects.create(
+            title='Путешествия', slug='travel', description='')
+        self.about_cats = Post.objects.create(
+            author=self.user, text='Кошки спят. Кошки едят. Собаки гуляют.')
+        self.about_dogs = Post.objects.create(
+            author=self.user, text='Собаки и кошки', group=self.group)
+
+    def found(self, query):
+        return [post.pk for post in search.search(query)[:10]]
+
+    def test_results_are_ranked(self):
+        self.assertEqual(self.found('кошки'),
+                         [self.about_cats.pk, self.about_dogs.pk])
+        self.assertEqual(search.search('кошки').count(), 2)
+
+    def test_all_words_are_required_last_is_prefix(self):
+        self.assertEqual(self.found('кошки гул'), [self.about_cats.pk])
+        self.assertEqual(self.found(''), [])
+        self.assertEqual(self.found('"*)('), [])
+
+    def test_group_title_is_searched(self):
+        self.assertEqual(self.found('путешествия'), [self.about_dogs.pk])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.about_cats.text = 'Рыбки'
+        self.about_cats.save()
+        self.assertEqual(self.found('рыбки'), [self.about_cats.pk])
+        self.assertEqual(self.found('кошки'), [self.about_dogs.pk])
+        self.about_dogs.delete()
+        self.assertEqual(self.found('кошки'), [])
+
+    def test_index_follows_group_renames_and_deletes(self):
+        self.group.title = 'Поездки'
+        self.group.save()
+        self.assertEqual(self.found('поездки'), [self.about_dogs.pk])
+        self.group.delete()
+        self.assertEqual(self.found('поездки'), [])
+        self.assertCountEqual(self.found('собаки'),
+                              [self.about_cats.pk, self.about_dogs.pk])
+
+    def test_rebuild_command(self):
+        Post.objects.filter(pk=self.about_cats.pk).update(text='Рыбки')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.found('рыбки'), [self.about_cats.pk])
+
+    def test_search_page_is_paginated(self):
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Кошка номер {number}')
+            for number in range(settings.COUNT_POSTS + 1))
+        search.rebuild()
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'кошка', 'page': 2})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, settings.COUNT_POSTS + 1)
+        self.assertEqual(len(page_obj), 1)
+        self.assertContains(response, '?q=%D0%BA%D0%BE%D1%88%D0%BA%D0%B0&'
+                                      'amp;page=1')
+
+
+class InvertedIndexTest(TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.backend = search.InvertedIndexBackend(directory)
+        self.directory = directory
+        user = User.objects.create_user(username='auth')
+        group = Group.objects.create(
+            title='Путешествия', slug='travel', description='')
+        self.about_cats = Post.objects.create(
+            author=user, text='Кошки спят. Кошки едят. Собаки гуляют.')
+        self.about_dogs = Post.objects.create(
+            author=user, text='Собаки и кошки', group=group)
+
+    def found(self, backend, query):
+        return backend.ids(query, 0, 10)
+
+    def test_rebuild_ranks_and_persists(self):
+        self.backend.rebuild()
+        self.assertEqual(self.found(self.backend, 'Кошки'),
+                         [self.about_cats.pk, self.about_dogs.pk])
+        self.assertEqual(self.found(self.backend, 'кошки путешествия'),
+                         [self.about_dogs.pk])
+        reopened = search.InvertedIndexBackend(self.directory)
+        self.assertEqual(reopened.count('собаки'), 2)
+
+    def test_changes_are_journaled_after_commit(self):
+        self.backend.rebuild()
+        reader = search.InvertedIndexBackend(self.directory)
+        self.assertEqual(reader.count('рыбки'), 0)
+        self.about_cats.text = 'Рыбки'
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.backend.index([self.about_cats])
+            self.backend.remove([self.about_dogs.pk])
+        self.assertEqual(self.backend.count('рыбки'), 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(reader.ids('рыбки', 0, 10), [self.about_cats.pk])
+        self.assertEqual(reader.count('собаки'), 0)
+
+    def test_readers_start_over_after_a_rebuild(self):
+        self.backend.rebuild()
+        reader = search.InvertedIndexBackend(self.directory)
+        self.about_cats.text = 'Рыбки ' * 20
+        with self.captureOnCommitCallbacks(execute=True):
+            self.backend.index([self.about_cats])
+        self.assertEqual(reader.count('рыбки'), 1)
+        Post.objects.filter(pk=self.about_cats.pk).update(text='Черепахи')
+        self.backend.rebuild()
+        self.about_dogs.text = 'Хомяки'
+        # The new journal grows past the reader's offset into the old one.
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(5):
+                self.backend.index([self.about_dogs])
+        self.assertEqual(reader.ids('черепахи', 0, 10), [self.about_cats.pk])
+        self.assertEqual(reader.count('рыбки'), 0)
+        self.assertEqual(reader.count('хомяки'), 1)
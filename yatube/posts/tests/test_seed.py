@@ -0,0 +1,64 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+from django.urls import reverse
+
+from chat.models import Message
+from .. import counters, seed
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+
+class SeedTest(TestCase):
+
+    def test_populate(self):
+        seed.populate(users=10, posts=40, groups=2, follows=3, comments=30,
+                      messages=15, rooms=2, days=30, batch_size=7)
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Group.objects.count(), 2)
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertEqual(Comment.objects.count(), 30)
+        self.assertEqual(Message.objects.count(), 15)
+        rooms = Message.objects.values_list('room', flat=True).distinct()
+        self.assertEqual(len(rooms), 2)
+        for room in rooms:
+            reverse('chat:room', kwargs={'room_name': room})
+        for user in User.objects.all():
+            self.assertEqual(Follow.objects.filter(user=user).count(), 3)
+            self.assertFalse(Follow.objects.filter(
+                user=user, author=user).exists())
+        end = seed.end_date(0)
+        self.assertFalse(Post.objects.exclude(
+            pub_date__range=(end - timedelta(days=30), end)).exists())
+        self.assertFalse(Comment.objects.filter(
+            pub_date__lt=F('post__pub_date')).exists())
+        post = Post.objects.filter(
+            comments__isnull=False).first()
+        self.assertEqual(post.comment_count, post.comments.count())
+        user = User.objects.first()
+        key = counters.key('following', user.pk)
+        self.assertEqual(counters.get([key]), {key: 3})
+        self.assertCountEqual(
+            TimelineEntry.objects.filter(user=user).values_list(
+                'post', flat=True),
+            Post.objects.filter(author__following__user=user).values_list(
+                'pk', flat=True))
+
+    def test_same_seed_same_posts(self):
+        seed.populate(users=3, posts=5, groups=1, seed=7)
+        posts = list(Post.objects.order_by('pk').values_list(
+            'text', 'pub_date'))
+        Post.objects.all().delete()
+        seed.populate(users=3, posts=5, groups=1, seed=7)
+        self.assertEqual(list(Post.objects.order_by('pk').values_list(
+            'text', 'pub_date')), posts)
+
+    def test_command(self):
+        stdout = StringIO()
+        call_command('seed', users=5, posts=10, groups=1, follows=2,
+                     comments=5, messages=5, bulk_load=True, verbosity=0,
+                     stdout=stdout)
+        self.assertEqual(Post.objects.count(), 10)
+        self.assertEqual(stdout.getvalue(), '')
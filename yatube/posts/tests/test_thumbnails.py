@@ -0,0 +1,127 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import thumbnails
+from ..models import Post, Thumbnail
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
+class ThumbnailPipelineTests(TestCase):
+    """sorl is patched: the pipeline, not the resizing, is under test."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.client.force_login(self.user)
+        patcher = mock.patch('posts.thumbnails.get_thumbnail',
+                             return_value=mock.Mock(
+                                 url='/media/cache/thumb.jpg',
+                                 width=250, height=200))
+        self.get_thumbnail = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_post(self, execute):
+        with self.captureOnCommitCallbacks(execute=execute):
+            self.client.post(reverse('posts:post_create'), {
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(
+                    'small.gif', SMALL_GIF, content_type='image/gif'),
+            })
+        return Post.objects.get()
+
+    def test_placeholder_until_thumbnails_are_ready(self):
+        post = self.create_post(execute=False)
+        self.assertFalse(post.thumbnails_ready)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Изображение обрабатывается')
+
+    def test_all_geometries_are_generated_after_commit(self):
+        post = self.create_post(execute=True)
+        self.assertTrue(post.thumbnails_ready)
+        self.assertEqual(
+            [(call.args[1], call.kwargs)
+             for call in self.get_thumbnail.call_args_list],
+            list(settings.POST_THUMBNAILS.values()))
+        self.assertEqual(
+            set(post.thumbnails.values_list('name', flat=True)),
+            set(settings.POST_THUMBNAILS))
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Изображение обрабатывается')
+        self.assertContains(response, 'src="/media/cache/thumb.jpg"')
+
+    def test_failed_generation_keeps_placeholder(self):
+        self.get_thumbnail.side_effect = OSError
+        with self.assertLogs('posts.thumbnails', 'ERROR'):
+            post = self.create_post(execute=True)
+        self.assertFalse(post.thumbnails_ready)
+
+    def test_failed_variants_do_not_hold_back_thumbnails(self):
+        with mock.patch('posts.derivatives.render', side_effect=OSError), \
+                self.assertLogs('posts.thumbnails', 'ERROR'):
+            post = self.create_post(execute=True)
+        self.assertTrue(post.thumbnails_ready)
+        self.assertFalse(post.derivatives.exists())
+        call_command('render_derivatives', stdout=StringIO())
+        self.assertTrue(post.derivatives.exists())
+
+    def test_text_edit_keeps_thumbnails(self):
+        post = self.create_post(execute=True)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(
+                reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+                {'text': 'Новый текст'})
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnails_ready)
+        self.assertEqual(callbacks, [])
+        self.assertTrue(post.thumbnails.exists())
+
+
+class AttachThumbnailsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='auth')
+        self.posts = Post.objects.bulk_create(
+            Post(author=user, text=f'пост {i}', image=f'posts/{i}.gif')
+            for i in range(5))
+        Thumbnail.objects.bulk_create(
+            Thumbnail(post=post, name='card', url=f'/media/{post.pk}.jpg',
+                      width=250, height=250)
+            for post in self.posts[:4])
+
+    def test_page_is_resolved_in_one_query_then_from_cache(self):
+        with self.assertNumQueries(1):
+            thumbnails.attach(self.posts, 'card')
+        self.assertEqual(self.posts[0].card_thumbnail.url,
+                         f'/media/{self.posts[0].pk}.jpg')
+        self.assertIsNone(self.posts[4].card_thumbnail)
+        with self.assertNumQueries(0):
+            thumbnails.attach(self.posts, 'card')
@@ -0,0 +1,121 @@
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.old_post = Post.objects.create(
+            author=self.author, text='Пост до подписки')
+
+    def follow_feed(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_new_posts_fan_out(self):
+        older = [Post.objects.create(author=self.author, text=f'Пост {i}')
+                 for i in range(3)]
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}))
+        new_post = Post.objects.create(
+            author=self.author, text='Пост после подписки')
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 5)
+        self.assertEqual(self.follow_feed(),
+                         [new_post, *reversed(older), self.old_post])
+
+    def test_unfollow_trims_timeline(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.follow_feed(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_prolific_author_is_merged_on_read(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        cache.clear()
+        new_post = Post.objects.create(
+            author=self.author, text='Пост популярного автора')
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=new_post).exists())
+        self.assertEqual(self.follow_feed(), [new_post, self.old_post])
+
+    @override_settings(COUNT_POSTS=2)
+    def test_feed_is_ordered_and_paged_on_timeline_entries(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [Post.objects.create(author=self.author, text=f'Пост {i}')
+                 for i in range(3)]
+        # Entries, not posts, decide the order.
+        TimelineEntry.objects.filter(post=posts[0]).update(
+            pub_date=posts[2].pub_date + timedelta(minutes=1))
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        page = response.context['page_obj']
+        self.assertEqual(list(page), [posts[0], posts[2]])
+        response = self.reader_client.get(
+            reverse('posts:follow_index'), {'cursor': page.next_cursor})
+        self.assertEqual(list(response.context['page_obj']),
+                         [posts[1], self.old_post])
+        self.assertEqual(timeline.posts(self.reader).query.order_by,
+                         timeline.ORDERING)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_leaving_prolific_set_is_fanned_out(self):
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        cache.clear()
+        merged = Post.objects.create(
+            author=self.author, text='Пост популярного автора')
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=merged).exists())
+        Follow.objects.filter(user=other).delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=merged).exists())
+        self.assertEqual(self.follow_feed(), [merged, self.old_post])
+
+    def test_rebuild_fills_existing_follows_and_drops_stale_entries(self):
+        # Follows without entries, as bulk_create skips the signals.
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.author)])
+        stranger = User.objects.create_user(username='stranger')
+        TimelineEntry.objects.create(user=stranger, post=self.old_post,
+                                     pub_date=self.old_post.pub_date)
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.follow_feed(), [self.old_post])
+        self.assertFalse(TimelineEntry.objects.filter(user=stranger).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_migration_fills_timelines_of_existing_follows(self):
+        migration = import_module('posts.migrations.0013_timelineentry')
+        other = User.objects.create_user(username='other')
+        prolific = User.objects.create_user(username='prolific')
+        Post.objects.create(author=prolific, text='Пост популярного автора')
+        Follow.objects.bulk_create([
+            Follow(user=self.reader, author=self.author),
+            Follow(user=self.reader, author=prolific),
+            Follow(user=other, author=prolific),
+        ])
+        migration.fill_timelines(apps, None)
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user', 'post')),
+            [(self.reader.pk, self.old_post.pk)])
@@ -3,12 +3,16 @@ import tempfile
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase, override_settings
+from django.test import (Client, TestCase, modify_settings,
+                         override_settings)
 from django.urls import reverse
 from django import forms
 from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Post, Group, Follow
+from .. import counters
+from ..models import Comment, Post, Group, Follow
 from ..forms import PostForm
 
 
@@ -251,6 +255,84 @@ class PaginatorViewTest(TestCase):
         self.assertEqual(len(response.context['page_obj']),
                          self.COUNT_POST_SECOND_PAGE)
 
+    def test_index_cursor_pages(self):
+        first_page = self.client.get(reverse('posts:index')).context[
+            'page_obj']
+        self.assertIsNone(first_page.previous_cursor)
+
+        second_page = self.client.get(
+            reverse('posts:index'),
+            {'cursor': first_page.next_cursor}).context['page_obj']
+        self.assertEqual(len(second_page), self.COUNT_POST_SECOND_PAGE)
+        self.assertIsNone(second_page.next_cursor)
+        self.assertFalse(set(first_page) & set(second_page))
+
+        back_page = self.client.get(
+            reverse('posts:index'),
+            {'cursor': second_page.previous_cursor}).context['page_obj']
+        self.assertEqual(list(back_page), list(first_page))
+        self.assertIsNone(back_page.previous_cursor)
+
+    def test_cursor_page_does_not_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}))
+        for query in queries:
+            self.assertNotIn('COUNT(', query['sql'])
+
+    def test_broken_cursor_gives_first_page(self):
+        response = self.client.get(reverse('posts:index'),
+                                   {'cursor': 'not-a-cursor'})
+        self.assertEqual(len(response.context['page_obj']),
+                         settings.COUNT_POSTS)
+
+
+@override_settings(COUNT_COMMENTS=10)
+@modify_settings(MIDDLEWARE={
+    'remove': 'core.middleware.AnonymousPageCacheMiddleware'})
+class CommentPaginationTest(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        self.url = reverse('posts:post_detail',
+                           kwargs={'post_id': self.post.pk})
+
+    def add_comments(self, count):
+        start = Comment.objects.count()
+        commenters = User.objects.bulk_create(
+            User(username=f'reader{i}') for i in range(start, start + count))
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=commenter, text=f'комментарий {i}')
+            for i, commenter in enumerate(commenters, start))
+        counters.rebuild()
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        return len(queries)
+
+    def test_post_detail_cost_does_not_grow_with_thread(self):
+        self.add_comments(1)
+        budget = self.count_queries()
+        self.add_comments(24)
+        self.assertEqual(self.count_queries(), budget)
+
+    def test_comments_are_paginated(self):
+        self.add_comments(13)
+        comments = self.client.get(self.url).context['comments']
+        self.assertEqual(len(comments), 10)
+        self.assertEqual(comments[0].text, 'комментарий 0')
+
+        data = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'cursor': comments.next_cursor}).json()
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            ['комментарий 10', 'комментарий 11', 'комментарий 12'])
+        self.assertEqual(data['comments'][0]['author'], 'reader10')
+        self.assertIsNone(data['next_cursor'])
+
 
 class FollowTests(TestCase):
     COUNT_POST = 0
@@ -0,0 +1,176 @@
+"""Thumbnails of post images, generated off the request path.
+
+``schedule`` runs after the post is committed and hands the work to a
+thread pool of ``POST_THUMBNAIL_WORKERS`` threads (0 runs it inline).
+The worker first replaces originals longer than ``POST_IMAGE_MAX_SIDE``
+or carrying metadata with a clean copy (see posts.derivatives), then
+renders every geometry in ``POST_THUMBNAILS`` through sorl, stores the
+results as ``Thumbnail`` rows and sets ``Post.thumbnails_ready``. Until
+then the templates show a placeholder instead of resizing inside the
+request, and the API does not link the original.
+
+Templates resolve a whole page of thumbnails at once with ``attach``
+(``{% prefetch_thumbnails %}``): one ``get_many`` and, for the misses,
+one query. Posts without rows, i.e. uploaded before the pipeline,
+fall back to sorl's ``{% thumbnail %}``. Once the thumbnails are
+ready, the same worker renders the responsive variants of the image
+(see posts.derivatives). A failure there leaves the post with
+thumbnails only, and manage.py render_derivatives tries again.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from sorl.thumbnail import get_thumbnail
+
+from . import derivatives
+from .cache import drop_post_caches, thumbnail_key
+from .models import Post, Thumbnail
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.POST_THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails')
+    return _executor
+
+
+def save_post(form):
+    """Save a ``PostForm``, queueing thumbnails when the image changed."""
+    image_changed = 'image' in form.changed_data
+    if image_changed:
+        form.instance.thumbnails_ready = not form.instance.image
+    post = form.save()
+    if image_changed:
+        forget(post.pk)
+        if post.image:
+            schedule(post)
+    return post
+
+
+def forget(post_id):
+    """Drop the stored thumbnails of a replaced or removed image."""
+    Thumbnail.objects.filter(post_id=post_id).delete()
+    forget_cached(post_id)
+    derivatives.forget(post_id)
+
+
+def forget_cached(post_id):
+    cache.delete_many(
+        [thumbnail_key(post_id, name) for name in settings.POST_THUMBNAILS])
+
+
+def schedule(post):
+    post_id, image = post.pk, post.image.name
+
+    def submit():
+        if settings.POST_THUMBNAIL_WORKERS:
+            executor().submit(generate, post_id, image)
+        else:
+            generate(post_id, image)
+
+    transaction.on_commit(submit)
+
+
+def clean_original(post):
+    """Swap ``post.image`` for its clean copy; False if the post got
+    another image meanwhile."""
+    image = post.image.name
+    cleaned = derivatives.clean_original(post)
+    if cleaned is None:
+        return True
+    if not Post.objects.filter(pk=post.pk, image=image).update(
+            image=cleaned):
+        post.image.storage.delete(cleaned)
+        return False
+    post.image.storage.delete(image)
+    post.image.name = cleaned
+    return True
+
+
+def generate(post_id, image):
+    """Render the thumbnails of ``image`` if it is still the post's, then
+    its variants."""
+    try:
+        post = Post.objects.filter(pk=post_id, image=image).only(
+            'author', 'group', 'image', 'updated').first()
+        if post is None or not clean_original(post):
+            return
+        rows = []
+        for name, (geometry, options) in settings.POST_THUMBNAILS.items():
+            thumbnail = get_thumbnail(post.image, geometry, **options)
+            rows.append(Thumbnail(post_id=post_id, name=name,
+                                  url=thumbnail.url, width=thumbnail.width,
+                                  height=thumbnail.height))
+        updated = timezone.now()
+        with transaction.atomic():
+            Thumbnail.objects.bulk_create(
+                rows, update_conflicts=True,
+                unique_fields=['post', 'name'],
+                update_fields=['url', 'width', 'height'])
+            Post.objects.filter(pk=post_id, image=post.image.name).update(
+                thumbnails_ready=True, updated=updated)
+        forget_cached(post_id)
+        drop_post_caches(post)
+        post.updated = updated
+        render_derivatives(post)
+    except Exception:
+        logger.exception('Could not make thumbnails of post %s', post_id)
+    finally:
+        if settings.POST_THUMBNAIL_WORKERS:
+            close_old_connections()
+
+
+def render_derivatives(post):
+    """Render the variants of ``post.image``; False if that failed.
+    ``post`` carries ``updated`` as stored: it moves so that cards pick
+    up the variants."""
+    try:
+        derivatives.render(post)
+    except Exception:
+        logger.exception('Could not render the variants of post %s',
+                         post.pk)
+        return False
+    if Post.objects.filter(pk=post.pk, image=post.image.name).update(
+            updated=timezone.now()):
+        drop_post_caches(post)
+    return True
+
+
+def attach(posts, name):
+    """Set ``post.<name>_thumbnail`` on posts whose thumbnails are ready.
+
+    The value is an unsaved ``Thumbnail`` with url, width and height, or
+    None when the post has no stored thumbnail and the template should
+    fall back to sorl.
+    """
+    keys = {thumbnail_key(post.pk, name): post for post in posts
+            if post.image and post.thumbnails_ready}
+    if not keys:
+        return
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        stored = {
+            post_id: (url, width, height)
+            for post_id, url, width, height in Thumbnail.objects.filter(
+                name=name, post__in=[keys[key].pk for key in missing]
+            ).values_list('post', 'url', 'width', 'height')
+        }
+        # Posts without rows are cached too, as an empty tuple.
+        fetched = {key: stored.get(keys[key].pk, ()) for key in missing}
+        cache.set_many(fetched, settings.POST_THUMBNAIL_CACHE_TIMEOUT)
+        found.update(fetched)
+    for key, post in keys.items():
+        url, width, height = found[key] or (None, None, None)
+        setattr(post, f'{name}_thumbnail', url and Thumbnail(
+            post=post, name=name, url=url, width=width, height=height))
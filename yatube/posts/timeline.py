@@ -0,0 +1,141 @@
+"""Materialized subscription feeds (fan-out on write).
+
+Every new post is copied into the ``TimelineEntry`` rows of its author's
+followers, so ``follow_index`` reads one user's entries instead of joining
+``Follow`` with ``Post``. Authors with more than ``TIMELINE_FANOUT_LIMIT``
+followers are not fanned out: their posts are merged in at read time.
+A new subscription backfills all the author's posts, unsubscribing
+removes the author's entries. An author who drops back to
+``TIMELINE_FANOUT_LIMIT`` followers has their whole history fanned out,
+including the posts that were only merged in while they were over it.
+"""
+from itertools import chain, groupby
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, F, OuterRef, Q
+
+from . import counters
+from .models import Follow, Post, TimelineEntry
+
+PROLIFIC_CACHE_KEY = 'timeline:prolific'
+BATCH_SIZE = 500
+# Order of ``posts``, for CursorPaginator: annotations that read the
+# TimelineEntry columns, so a page is a range scan of its index.
+ORDERING = ('-feed_date', '-feed_post')
+
+
+def _prolific_author_ids():
+    return frozenset(
+        Follow.objects.order_by().values('author').annotate(
+            followers=Count('pk')
+        ).filter(
+            followers__gt=settings.TIMELINE_FANOUT_LIMIT
+        ).values_list('author', flat=True))
+
+
+def prolific_author_ids():
+    """Authors served by fan-out on read, cached for a while."""
+    return cache.get_or_set(PROLIFIC_CACHE_KEY, _prolific_author_ids,
+                            settings.TIMELINE_PROLIFIC_TIMEOUT)
+
+
+def fan_out(post):
+    if post.author_id in prolific_author_ids():
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def entries(user_ids, author_id):
+    """Unsaved entries of every post of ``author_id`` for ``user_ids``."""
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date')
+    for pk, pub_date in posts.iterator():
+        for user_id in user_ids:
+            yield TimelineEntry(user_id=user_id, post_id=pk,
+                                pub_date=pub_date)
+
+
+def _insert(entries):
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def backfill(user_id, author_id):
+    if author_id in prolific_author_ids():
+        return
+    _insert(entries([user_id], author_id))
+
+
+def fan_out_history(author_ids):
+    """Call after ``author_ids`` each lost a follower: those now at
+    ``TIMELINE_FANOUT_LIMIT`` followers stop being merged in at read
+    time, so their posts are copied to all their followers."""
+    keys = {counters.key('followers', author_id): author_id
+            for author_id in author_ids}
+    left = [keys[key] for key, value in counters.get(list(keys)).items()
+            if value == settings.TIMELINE_FANOUT_LIMIT]
+    if not left:
+        return
+    cache.delete(PROLIFIC_CACHE_KEY)
+    for author_id in left:
+        followers = list(Follow.objects.filter(
+            author_id=author_id).values_list('user_id', flat=True))
+        _insert(entries(followers, author_id))
+
+
+def remove(user_id, author_ids):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id__in=author_ids).delete()
+
+
+def rebuild():
+    """Make every timeline match Follow and Post: copy the posts missing
+    from them and delete the entries of follows that are gone."""
+    TimelineEntry.objects.exclude(Exists(Follow.objects.filter(
+        user=OuterRef('user'), author=OuterRef('post__author')))).delete()
+    cache.delete(PROLIFIC_CACHE_KEY)
+    follows = Follow.objects.exclude(
+        author_id__in=prolific_author_ids()).order_by('author_id')
+    pairs = follows.values_list('author_id', 'user_id').iterator()
+    _insert(chain.from_iterable(
+        entries([user_id for _, user_id in group], author_id)
+        for author_id, group in groupby(pairs, key=lambda pair: pair[0])))
+
+
+def _followed_prolific(user):
+    prolific = prolific_author_ids()
+    if not prolific:
+        return []
+    return list(Follow.objects.filter(
+        user=user, author_id__in=prolific).values_list(
+            'author_id', flat=True))
+
+
+def posts(user):
+    """Subscription feed of ``user`` as a Post queryset in ``ORDERING``.
+    """
+    feed = Post.objects.for_feed()
+    prolific = _followed_prolific(user)
+    if not prolific:
+        feed = feed.filter(timeline_entries__user=user).annotate(
+            feed_date=F('timeline_entries__pub_date'),
+            feed_post=F('timeline_entries__post'))
+        return feed.order_by(*ORDERING)
+    # Merged posts have no entry; entries copy the post columns anyway.
+    feed = feed.filter(
+        Q(pk__in=TimelineEntry.objects.filter(user=user).values('post_id'))
+        | Q(author_id__in=prolific)).annotate(
+            feed_date=F('pub_date'), feed_post=F('pk'))
+    return feed.order_by(*ORDERING)
+
+
+def count(user):
+    return user.timeline.count() + counters.total(
+        counters.key('author_posts', author_id)
+        for author_id in _followed_prolific(user))
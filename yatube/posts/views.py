@@ -2,73 +2,171 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.conf import settings
-
-from .models import Post, Group, User, Follow
+from django.http import JsonResponse
+from django.utils.http import urlencode
+
+from core.cache import get_generation
+from core.conditional import conditional_page
+from core.paginator import CountedPaginator, CursorPaginator
+from core.uploads import bounded_uploads
+from . import (counters, follow_graph, follows, search, thumbnails,
+               timeline)
+from .cache import (FEED, author_namespace, follows_namespace,
+                    group_namespace, post_namespaces)
+from .models import Comment, Post, Group, User
 from .forms import PostForm, CommentForm
 
 
-def pagination(request, post_list):
-    paginator = Paginator(post_list, settings.COUNT_POSTS)
+def pagination(request, post_list, count=None,
+               ordering=('-pub_date', '-pk')):
+    """Page of the feed. ``count`` is a callable giving its maintained
+    total, the numbered fallback counts the queryset without it."""
     page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    if page_number is not None and settings.PAGINATION_NUMBERED_FALLBACK:
+        if count is None:
+            paginator = Paginator(post_list, settings.COUNT_POSTS)
+        else:
+            paginator = CountedPaginator(
+                post_list, settings.COUNT_POSTS, count=count)
+        return paginator.get_page(page_number)
+    paginator = CursorPaginator(post_list, settings.COUNT_POSTS, ordering)
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+def comments_page(post_id, cursor=None):
+    """Page of a post's comments, oldest first; next_cursor goes newer."""
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).for_thread(),
+        settings.COUNT_COMMENTS,
+        ordering=('pub_date', 'pk'))
+    return paginator.get_page(cursor)
+
+
+def page_group(request, slug):
+    """The group of a group page, looked up once per request."""
+    if not hasattr(request, 'page_group'):
+        request.page_group = get_object_or_404(Group, slug=slug)
+    return request.page_group
+
+
+def page_author(request, username):
+    """The author of a profile page, looked up once per request."""
+    if not hasattr(request, 'page_author'):
+        request.page_author = get_object_or_404(User, username=username)
+    return request.page_author
+
+
+def page_post(request, post_id):
+    """The post of a post page, looked up once per request."""
+    if not hasattr(request, 'page_post'):
+        request.page_post = get_object_or_404(
+            Post.objects.select_related('author', 'group'), pk=post_id)
+    return request.page_post
+
+
+def group_namespaces(request, slug):
+    return [group_namespace(page_group(request, slug).pk)]
+
 
+def profile_namespaces(request, username):
+    author_id = page_author(request, username).pk
+    return [author_namespace(author_id), follows_namespace(author_id)]
 
+
+@conditional_page(lambda request: [FEED])
 def index(request):
-    post_list = Post.objects.all()
-    page_obj = pagination(request, post_list)
+    post_list = Post.objects.for_feed()
+    page_obj = pagination(request, post_list, count=lambda: counters.total(
+        [counters.key('posts')]))
 
     context = {
         'page_obj': page_obj,
+        'cache_generation': get_generation(FEED),
+        'followed_on_page': follow_graph.followed_on(page_obj, request.user),
     }
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page(group_namespaces)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = pagination(request, post_list)
+    group = page_group(request, slug)
+    post_list = group.posts.for_feed()
+    page_obj = pagination(request, post_list, count=lambda: counters.total(
+        [counters.key('group_posts', group.pk)]))
     context = {
         'group': group,
         'page_obj': page_obj,
+        'cache_generation': get_generation(group_namespace(group.pk)),
+        'followed_on_page': follow_graph.followed_on(page_obj, request.user),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page(profile_namespaces)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    count_posts = post_list.count()
-    page_obj = pagination(request, post_list)
+    author = page_author(request, username)
+    post_list = author.posts.for_feed()
+    keys = counters.profile_keys(author.pk)
+    values = counters.get(keys)
+    count_posts, count_followers, count_following = map(values.get, keys)
+    page_obj = pagination(request, post_list, count=lambda: count_posts)
 
-    following = request.user.is_authenticated and author.following.filter(
-        user=request.user
-    ).exists()
+    following = follow_graph.is_following(request.user, author.pk)
 
     context = {
         'username': username,
         'author': author,
         'page_obj': page_obj,
         'count_posts': count_posts,
-        'following': following
-
+        'count_followers': count_followers,
+        'count_following': count_following,
+        'following': following,
+        'cache_generation': get_generation(author_namespace(author.pk)),
     }
 
     return render(request, 'posts/profile.html', context)
 
 
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(search.search(query), settings.COUNT_POSTS)
+    context = {
+        'query': query,
+        'page_obj': paginator.get_page(request.GET.get('page')),
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def detail_namespaces(request, post_id):
+    return sorted(post_namespaces(page_post(request, post_id)))
+
+
+@conditional_page(detail_namespaces)
 def post_detail(request, post_id):
-    posts_detail = get_object_or_404(Post, pk=post_id)
+    posts_detail = page_post(request, post_id)
     comment_form = CommentForm(request.POST or None)
-    comments = posts_detail.comments.all()
+    comments = comments_page(post_id)
     context = {
         'posts_detail': posts_detail,
         'comment_form': comment_form,
         'comments': comments,
+        'count_author_posts': counters.total(
+            [counters.key('author_posts', posts_detail.author_id)]),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    page = comments_page(post_id, request.GET.get('cursor'))
+    return JsonResponse({
+        'comments': [comment.as_dict() for comment in page],
+        'next_cursor': page.next_cursor,
+    })
+
+
 @login_required
+@bounded_uploads
 def post_create(request):
     form = PostForm(request.POST or None,
                     files=request.FILES or None)
@@ -76,12 +174,13 @@ def post_create(request):
     context = {'form': form}
     if form.is_valid():
         form.instance.author = request.user
-        form.save()
+        thumbnails.save_post(form)
         return redirect('posts:profile', request.user)
     return render(request, template_name, context)
 
 
 @login_required
+@bounded_uploads
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = PostForm(
@@ -91,7 +190,7 @@ def post_edit(request, post_id):
     if request.user != post.author:
         return redirect('posts:post_detail', post.id)
     if form.is_valid():
-        form.save()
+        thumbnails.save_post(form)
         return redirect('posts:post_detail', post.id)
 
     context = {
@@ -117,8 +216,10 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = pagination(request, post_list)
+    post_list = timeline.posts(request.user)
+    page_obj = pagination(request, post_list,
+                          count=lambda: timeline.count(request.user),
+                          ordering=timeline.ORDERING)
     context = {'page_obj': page_obj}
     return render(request, 'posts/follow.html', context)
 
@@ -126,15 +227,12 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if request.user != author:
-        Follow.objects.get_or_create(user=request.user, author=author)
+    follows.follow(request.user, author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    follow_filter = Follow.objects.filter(user=request.user, author=author)
-    if follow_filter.exists():
-        follow_filter.delete()
+    follows.unfollow(request.user, author)
     return redirect('posts:profile', username=username)
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -87,10 +88,62 @@ DATABASES = {
     }
 }
 
+# Cache backend, picked by environment. locmem is private to each worker
+# process; file, memcached and redis are shared by all of them (set
+# CACHE_LOCATION; `manage.py cacheserver` is a local stand-in for redis).
+# CACHE_LOCAL_TIER=1 puts a small in-process LRU in front of the shared
+# cache, see core.cache_backends.TwoTierCache.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHE_LOCATION = os.getenv('CACHE_LOCATION', {
+    'file': os.path.join(BASE_DIR, 'cache'),
+    'memcached': '127.0.0.1:11211',
+    'redis': 'redis://127.0.0.1:6379/0',
+}.get(CACHE_BACKEND, ''))
+CACHE_LOCAL_TIER = os.getenv('CACHE_LOCAL_TIER') == '1'
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': CACHE_LOCATION,
+    }
+}
+if CACHE_LOCAL_TIER:
+    CACHES['shared'] = CACHES['default']
+    CACHES['default'] = {
+        'BACKEND': 'core.cache_backends.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_TIMEOUT': 5,
+            'LOCAL_MAX_ENTRIES': 500,
+            # Generations must be current for invalidation to be exact.
+            'BYPASS_PREFIXES': ('generation:',),
+        },
     }
+
+# Template fragments and whole pages go through a stale-while-revalidate
+# wrapper (core.cache_backends.StaleWhileRevalidateCache): one request
+# recomputes an expired entry while the others get the stale copy.
+# Concurrent misses of a page wait up to LOCK_WAIT seconds for the one
+# that renders it; fragment misses never wait, as a page may miss many
+# cards in a row.
+CACHES['pages'] = {
+    'BACKEND': 'core.cache_backends.StaleWhileRevalidateCache',
+    'OPTIONS': {
+        'TARGET': 'default',
+        'STALE_TIMEOUT': 60 * 5,
+        'LOCK_TIMEOUT': 30,
+        'LOCK_WAIT': 2,
+    },
+}
+CACHES['template_fragments'] = {
+    **CACHES['pages'],
+    'OPTIONS': {**CACHES['pages']['OPTIONS'], 'LOCK_WAIT': 0},
 }
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -138,14 +191,92 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Thumbnails rendered for every uploaded post image by posts.thumbnails,
+# by name: card in feeds, detail on post_detail. The {% thumbnail %}
+# fallbacks in the templates must use the same arguments.
+POST_THUMBNAILS = {
+    'card': ('250x250', {'crop': 'center', 'upscale': True}),
+    'detail': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+POST_THUMBNAIL_WORKERS: int = 2
+# How long resolved thumbnail URLs stay in the cache.
+POST_THUMBNAIL_CACHE_TIMEOUT: int = 60 * 60 * 24
+# Post images are streamed to temporary files (core.uploads); larger
+# files and images with more pixels are rejected, originals with a longer
+# side than POST_IMAGE_MAX_SIDE are scaled down by the thumbnail worker.
+UPLOAD_MAX_BYTES: int = 10 * 1024 * 1024
+UPLOAD_MAX_PIXELS: int = 40 * 10 ** 6
+POST_IMAGE_MAX_SIDE: int = 2560
+# Responsive variants of post images (posts.derivatives): widths of the
+# srcset and formats, best first; formats Pillow cannot write are skipped.
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_FORMATS = ('avif', 'webp', 'jpeg')
+POST_IMAGE_QUALITY = {'avif': 50, 'webp': 75, 'jpeg': 80}
+
 COUNT_POSTS: int = 10
+# Comments shown under a post and per "load more" request.
+COUNT_COMMENTS: int = 20
+# Anonymous feed pages are public and revalidated with ETags derived
+# from cache generations (core.conditional); proxies may reuse them
+# without revalidating for this many seconds.
+PAGE_CACHE_MAX_AGE: int = 0
+# Anonymous pages are also kept whole (core.middleware, in the pages
+# cache) and refreshed after PAGE_CACHE_TIMEOUT seconds.
+PAGE_CACHE_TIMEOUT: int = 60 * 10
+# Full-text search (posts.search): fts5, inverted or auto (fts5 where
+# SQLite has it). The inverted index is kept in SEARCH_INDEX_DIR.
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')
+SEARCH_INDEX_DIR = os.getenv('SEARCH_INDEX_DIR', os.path.join(
+    BASE_DIR, 'search_index'))
+# Feeds are paginated by cursor; ``?page=N`` links still work while True.
+PAGINATION_NUMBERED_FALLBACK: bool = True
+
+# Subscription feed (posts.timeline): new posts are copied to followers'
+# timelines unless the author has more than TIMELINE_FANOUT_LIMIT
+# followers, such authors are merged into the feed when it is read.
+TIMELINE_FANOUT_LIMIT: int = 1000
+TIMELINE_PROLIFIC_TIMEOUT: int = 60 * 10
+# How long a user's followed-author set (posts.follow_graph) stays cached.
+FOLLOW_GRAPH_TIMEOUT: int = 60 * 60 * 24
+# Usernames accepted by one request to the bulk follow API.
+FOLLOWS_BULK_LIMIT: int = 1000
 
 
 ASGI_APPLICATION = "yatube.asgi.application"
 
 
+# Chat messages are saved in batches, see chat.buffer.
+CHAT_BUFFER_SIZE: int = 100
+CHAT_FLUSH_INTERVAL_MS: int = 200
+# Messages shown when a room opens and per "load older" request.
+CHAT_HISTORY_SIZE: int = 50
+
+# Chat fan-out between worker processes. sqlite is shared by the workers
+# of one host (see chat.layers), redis by any number of hosts, memory
+# only reaches sockets of the same process.
+CHANNEL_LAYER = os.getenv('CHANNEL_LAYER', 'sqlite')
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': "channels.layers.InMemoryChannelLayer"
-    }
+        'memory': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+        'sqlite': {
+            'BACKEND': 'chat.layers.SQLiteChannelLayer',
+            'CONFIG': {
+                'path': os.getenv('CHANNEL_LAYER_LOCATION', os.path.join(
+                    BASE_DIR, 'channels.sqlite3')),
+                'capacity': 100,
+                'expiry': 60,
+            },
+        },
+        'redis': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [os.getenv('CHANNEL_LAYER_LOCATION',
+                                    'redis://127.0.0.1:6379/1')],
+                'capacity': 100,
+                'expiry': 60,
+            },
+        },
+    }[CHANNEL_LAYER]
 }